@@ -1,6 +1,6 @@
 import streamlit as st
 import os
-from PyPDF2 import PdfReader
+from pdf_utils import IngestedUploads, extract_pages_from_pdfs, pdf_text_cache
 from dotenv import load_dotenv
 import google.generativeai as genai
 from deep_translator import GoogleTranslator
@@ -62,19 +62,26 @@ def play_text_as_audio(text, language_code="en"):
         st.error(f"❌ Error generating audio: {str(e)}")
 
 
-# 📂 Function to Extract Text from PDFs
+# 📂 Function to Extract Text from PDFs (one entry per file, None when nothing could be read)
 def extract_text_from_pdfs(uploaded_files):
     extracted_texts = []
-    for pdf_file in uploaded_files:
-        try:
-            pdf_reader = PdfReader(pdf_file)
-            text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-            if text.strip():
-                extracted_texts.append(text.strip())
-            else:
-                st.warning(translate_text(f"⚠ Could not extract text from {pdf_file.name}. It may be an image-based PDF."))
-        except Exception as e:
-            st.error(translate_text(f"❌ Error reading {pdf_file.name}: {str(e)}"))
+    progress_bar = st.progress(0.0, text=translate_text("📄 Extracting pages..."))
+    all_pages = extract_pages_from_pdfs(
+        uploaded_files,
+        progress_callback=lambda done, total: progress_bar.progress(done / total if total else 1.0)
+    )
+    progress_bar.empty()
+    for pdf_file, pages in zip(uploaded_files, all_pages):
+        if isinstance(pages, Exception):
+            st.error(translate_text(f"❌ Error reading {pdf_file.name}: {str(pages)}"))
+            extracted_texts.append(None)
+            continue
+        text = "\n".join([page_text for page_text in pages if page_text])
+        if text.strip():
+            extracted_texts.append(text.strip())
+        else:
+            extracted_texts.append(None)
+            st.warning(translate_text(f"⚠ Could not extract text from {pdf_file.name}. It may be an image-based PDF."))
     return extracted_texts
 
 # 🚀 Attractive Heading
@@ -107,14 +114,27 @@ with col2:
 if "text_chunks" not in st.session_state:
     st.session_state.text_chunks = []
 
+if "ingested_uploads" not in st.session_state:
+    st.session_state.ingested_uploads = IngestedUploads()
+
 uploaded_files = st.file_uploader(translate_text("📂 Upload Your PDFs"), type=["pdf"], accept_multiple_files=True)
 
+# ♻ Only PDFs not seen before are extracted; reruns reuse the stored text
+def ingest_pdfs(new_files):
+    texts = extract_text_from_pdfs([pdf_file for _, pdf_file in new_files])
+    return {key: text for (key, _), text in zip(new_files, texts)}
+
+extracted_texts, _ = st.session_state.ingested_uploads.sync(uploaded_files or [], ingest_pdfs)
+
 if uploaded_files:
-    extracted_texts = extract_text_from_pdfs(uploaded_files)
     if extracted_texts:
         st.session_state.text_chunks = extracted_texts  
         st.success(translate_text(f"✅ Extracted text from {len(uploaded_files)} PDFs successfully!"))
 
+    cache_stats = pdf_text_cache.stats()
+    st.sidebar.caption(f"🗄 PDF cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+                       f"{cache_stats['size_bytes'] / 1024 / 1024:.1f} MB")
+
 # 🔗 Feature Navigation
 menu_options = {
     "🏠 Home": None,
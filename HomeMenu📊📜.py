@@ -1,17 +1,20 @@
 import streamlit as st
 import os
-from PyPDF2 import PdfReader
+from pdf_utils import IngestedUploads, extract_pages_from_pdfs, pdf_text_cache
+from chunk_store import ChunkStore
+from embedding_cache import embedding_cache, get_cached_embeddings
+from embedding_executor import embed_concurrently
+from index_store import IncrementalIndex
 from dotenv import load_dotenv
 import google.generativeai as genai
 from deep_translator import GoogleTranslator
 from gtts import gTTS
 import tempfile
-from langchain.text_splitter import RecursiveCharacterTextSplitter, CharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
+from contextlib import nullcontext
+from text_utils import get_text_splitter
 from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_gateway import llm_gateway
 
 # 📌 Set Up Page Configuration
 st.set_page_config(page_title="Multi-PDF AI Tool", page_icon="📚", layout="wide")
@@ -68,54 +71,67 @@ def play_text_as_audio(text, language_code="en"):
     except Exception as e:
         st.error(f"❌ Error generating audio: {str(e)}")
 
-# 📂 Function to Extract Text from PDFs
+# 📂 Function to Extract Text from PDFs (one entry per file, None when nothing could be read)
 def extract_text_from_pdfs(uploaded_files):
     extracted_texts = []
-    for pdf_file in uploaded_files:
-        try:
-            pdf_reader = PdfReader(pdf_file)
-            text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-            if text.strip():
-                extracted_texts.append(text.strip())
-            else:
-                st.warning(translate_text(f"⚠ Could not extract text from {pdf_file.name}. It may be an image-based PDF."))
-        except Exception as e:
-            st.error(translate_text(f"❌ Error reading {pdf_file.name}: {str(e)}"))
+    progress_bar = st.progress(0.0, text=translate_text("📄 Extracting pages..."))
+    all_pages = extract_pages_from_pdfs(
+        uploaded_files,
+        progress_callback=lambda done, total: progress_bar.progress(done / total if total else 1.0)
+    )
+    progress_bar.empty()
+    for pdf_file, pages in zip(uploaded_files, all_pages):
+        if isinstance(pages, Exception):
+            st.error(translate_text(f"❌ Error reading {pdf_file.name}: {str(pages)}"))
+            extracted_texts.append(None)
+            continue
+        text = "\n".join([page_text for page_text in pages if page_text])
+        if text.strip():
+            extracted_texts.append(text.strip())
+        else:
+            extracted_texts.append(None)
+            st.warning(translate_text(f"⚠ Could not extract text from {pdf_file.name}. It may be an image-based PDF."))
     return extracted_texts
 
 # FAISS-related functions with improved error handling
 def get_text_chunks(text):
     try:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=10000,
-            chunk_overlap=1000,
-            separators=["\n\n", "\n", ".", " ", ""]
-        )
+        text_splitter = get_text_splitter("vector_store")
         chunks = text_splitter.split_text(text)
         return chunks
     except Exception as e:
         st.error(f"Error splitting text: {str(e)}")
         return []
 
-def get_vector_store(text_chunks):
+# Chunks embedded before, by any session, are served from the local embedding cache
+def get_embeddings():
+    return get_cached_embeddings(google_api_key=GOOGLE_API_KEY)
+
+def embed_text_chunks(text_chunks):
+    # Batched requests run concurrently; a bad key or quota error surfaces from the first batch
+    return embed_concurrently(get_embeddings().embed_documents, text_chunks)
+
+# ➕➖ Bring the session's index in line with the ready files: new files are appended, removed
+# ones are dropped, and files already indexed are left untouched. Duplicates across files share
+# one entry that lists every file and chunk it came from.
+# 🧬 Only a new file's chunks are deduplicated, against everything already indexed, and only
+# chunks that repeat nothing there (exactly or nearly) are embedded.
+def update_vector_store(vector_store, documents):
     try:
-        if not text_chunks:
-            raise ValueError("No text chunks provided for vector store creation")
-            
-        embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=GOOGLE_API_KEY
-        )
-        
-        # Verify embeddings work with a small test
-        test_embedding = embeddings.embed_query("test")
-        if not test_embedding:
-            raise ValueError("Embedding test failed")
-            
-        vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-        return vector_store
+        keys = {document["key"] for document in documents}
+        for key in vector_store.document_keys():
+            if key not in keys:
+                vector_store.remove_document(key)
+
+        indexed = set(vector_store.document_keys())
+        added = 0
+        for document in documents:
+            if document["key"] not in indexed:
+                vector_store.add_document(document["key"], document["chunks"], name=document["name"], embed=embed_text_chunks)
+                added += 1
+        return added
     except Exception as e:
-        st.error(f"Error creating vector store: {str(e)}")
+        st.error(f"Error updating vector store: {str(e)}")
         return None
 
 def get_conversational_chain():
@@ -127,11 +143,7 @@ def get_conversational_chain():
         Question: {question}
         Answer:
         """
-        model = ChatGoogleGenerativeAI(
-            model="gemini-pro",
-            temperature=0.3,
-            google_api_key=GOOGLE_API_KEY
-        )
+        model = llm_gateway.chat_model(temperature=0.3, google_api_key=GOOGLE_API_KEY)
         prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
         chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
         return chain
@@ -169,26 +181,44 @@ with col2:
 if "text_chunks" not in st.session_state:
     st.session_state.text_chunks = []
 if "vector_store" not in st.session_state:
-    st.session_state.vector_store = None
+    st.session_state.vector_store = IncrementalIndex(get_embeddings())
+if "ingested_uploads" not in st.session_state:
+    st.session_state.ingested_uploads = IngestedUploads()
 
 uploaded_files = st.file_uploader(translate_text("📂 Upload Your PDFs"), type=["pdf"], accept_multiple_files=True)
 
+# ♻ Only PDFs not seen before are extracted and chunked; reruns reuse the stored results
+def ingest_pdfs(new_files):
+    texts = extract_text_from_pdfs([pdf_file for _, pdf_file in new_files])
+    return {
+        # Chunks are offsets into the file's text rather than copies of it
+        key: {"key": key, "name": pdf_file.name, "text": text,
+              "chunks": ChunkStore.from_chunks(text, get_text_chunks(text))} if text else None
+        for (key, pdf_file), text in zip(new_files, texts)
+    }
+
+documents, _ = st.session_state.ingested_uploads.sync(uploaded_files or [], ingest_pdfs)
+
 if uploaded_files:
-    extracted_texts = extract_text_from_pdfs(uploaded_files)
-    if extracted_texts:
-        st.session_state.text_chunks = extracted_texts
-        # Process text with FAISS
-        combined_text = " ".join(extracted_texts)
-        chunks = get_text_chunks(combined_text)
-        
-        if chunks:  # Only proceed if we got valid chunks
-            with st.spinner(translate_text("Creating vector store (this may take a moment)...")):
-                vector_store = get_vector_store(chunks)
-                if vector_store:
-                    st.session_state.vector_store = vector_store
-                    st.success(translate_text("✅ Vector store created successfully!"))
-                else:
-                    st.error(translate_text("❌ Failed to create vector store"))
+    if documents:
+        st.session_state.text_chunks = [document["text"] for document in documents]
+
+    cache_stats = pdf_text_cache.stats()
+    st.sidebar.caption(f"🗄 PDF cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+                       f"{cache_stats['size_bytes'] / 1024 / 1024:.1f} MB")
+    embedding_stats = embedding_cache.stats()
+    st.sidebar.caption(f"🧮 Embedding cache: {embedding_stats['hit_rate']:.0%} hit rate, {embedding_stats['entries']} vectors")
+
+# Removed files leave the index too, so this also runs when nothing is uploaded; files that
+# failed to embed are not indexed and are retried on the next run
+ready = [document for document in documents if document["chunks"]]
+unindexed = {document["key"] for document in ready} - set(st.session_state.vector_store.document_keys())
+with st.spinner(translate_text("Creating vector store (this may take a moment)...")) if unindexed else nullcontext():
+    added = update_vector_store(st.session_state.vector_store, ready)
+if added:
+    st.success(translate_text(f"✅ Vector store updated: {added} new file(s) indexed!"))
+elif added is None:
+    st.error(translate_text("❌ Failed to update vector store"))
 
 # 🔗 Feature Navigation
 menu_options = {
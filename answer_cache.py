@@ -0,0 +1,116 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from keyword_index import TOKEN_PATTERN
+
+# 💬 A question is answered from the cache when its embedding is at least this similar (cosine)
+# to one already answered over the same documents, mentions the same numbers and codes, and that
+# answer is younger than the TTL. Embeddings barely move between "2022 revenue" and "2023
+# revenue" (or "section 4.2" and "4.3"), so the threshold alone cannot tell those apart.
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", "24")) * 3600
+# Answers kept per group (document set + numbers and codes), and groups kept, least recently
+# used dropped first
+ANSWER_CACHE_MAX_ANSWERS = 1000
+ANSWER_CACHE_MAX_SETS = 4096
+
+
+def document_set_fingerprint(doc_ids):
+    """Identity of the documents a question is asked over, in any order."""
+    digest = hashlib.sha256()
+    for doc_id in sorted(set(doc_ids)):
+        digest.update(doc_id.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def question_terms(question):
+    """The numbers and codes a question mentions ("2023", "4.2", "ab-123"), in a stable order."""
+    return tuple(sorted({token for token in TOKEN_PATTERN.findall(question.lower())
+                         if any(char.isdigit() for char in token)}))
+
+
+class SemanticAnswerCache:
+    """
+    Answers remembered per document set, looked up by question embedding. Questions are only
+    compared with earlier ones that mention the same numbers and codes (question_terms), and
+    each such group keeps its normalised question vectors in one matrix, so a lookup is a
+    single matrix-vector product.
+    Records hits, misses, expired answers and lookup time for the sidebar.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL_SECONDS,
+                 max_answers=ANSWER_CACHE_MAX_ANSWERS, max_sets=ANSWER_CACHE_MAX_SETS):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_answers = max_answers
+        self.max_sets = max_sets
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.lookup_seconds = 0.0
+        self._sets = OrderedDict()  # (fingerprint, terms) -> (question vectors, [(question, answer, created), ...])
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _drop_expired(self, key, now):
+        vectors, entries = self._sets[key]
+        live = [i for i, (_, _, created) in enumerate(entries) if now - created < self.ttl]
+        if len(live) < len(entries):
+            self.expired += len(entries) - len(live)
+            self._sets[key] = (vectors[live], [entries[i] for i in live])
+
+    def lookup(self, fingerprint, question, vector):
+        """The cached (question, answer, similarity) closest to vector, or None on a miss."""
+        start = time.perf_counter()
+        key = (fingerprint, question_terms(question))
+        with self._lock:
+            try:
+                if key in self._sets:
+                    self._sets.move_to_end(key)
+                    self._drop_expired(key, time.time())
+                    vectors, entries = self._sets[key]
+                    if entries:
+                        similarities = vectors @ self._normalise(vector)
+                        best = int(np.argmax(similarities))
+                        if similarities[best] >= self.threshold:
+                            self.hits += 1
+                            question, answer, _ = entries[best]
+                            return question, answer, float(similarities[best])
+                self.misses += 1
+                return None
+            finally:
+                self.lookup_seconds += time.perf_counter() - start
+
+    def store(self, fingerprint, question, vector, answer):
+        vector = self._normalise(vector)
+        key = (fingerprint, question_terms(question))
+        with self._lock:
+            vectors, entries = self._sets.pop(key, (np.empty((0, len(vector)), dtype=np.float32), []))
+            vectors = np.vstack([vectors, vector])[-self.max_answers:]
+            entries = (entries + [(question, answer, time.time())])[-self.max_answers:]
+            self._sets[key] = (vectors, entries)
+            while len(self._sets) > self.max_sets:
+                self._sets.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "answers": sum(len(entries) for _, entries in self._sets.values()),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "avg_lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+            }
+
+
+# Shared by every session of this process
+answer_cache = SemanticAnswerCache()
@@ -2,13 +2,8 @@
 import streamlit as st
 import google.generativeai as genai
 import streamlit.components.v1 as components
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 import os
 from deep_translator import GoogleTranslator
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
 from langchain.chains import load_summarize_chain
@@ -17,6 +12,7 @@ import pyttsx3  # For text-to-speech (pyttsx3)
 from gtts import gTTS  # For text-to-speech (Google TTS)
 import tempfile  # For temporary file handling
 import json
+from functools import lru_cache
 from langchain.schema import Document
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
@@ -26,7 +22,18 @@ from utils import word_dict
 from game import HangmanGame
 import requests
 from serpapi import search
-from langchain.text_splitter import CharacterTextSplitter
+from pdf_utils import extract_pages_from_pdfs, iter_pdf_pages, pdf_fingerprint, pdf_text_cache
+from text_utils import CHUNK_CONFIGS, CHUNK_LENGTH_MODE, TOKEN_BUDGETS, get_text_splitter, iter_text_chunks
+from jobs import get_job, submit_job
+from chunk_store import ChunkStore
+from dedup import DEDUP_THRESHOLD, deduplicate_chunks
+from embedding_cache import EMBEDDING_MODEL, embedding_cache, get_cached_embeddings
+from embedding_executor import embed_concurrently
+from index_store import VECTOR_PRECISION, build_vector_store, document_index_id, index_store, retrieval_cache
+from keyword_index import KeywordIndex
+from answer_cache import answer_cache, document_set_fingerprint
+from llm_gateway import generate_content, llm_gateway, stream_content
+from response_cache import response_cache
 # Set the page config at the very top of the script
 st.set_page_config("Multi PDF Chatbot", page_icon=":scroll:")
 def load_css():
@@ -51,16 +58,26 @@ def configure_genai():
         st.error(f"Error configuring Google API: {str(e)}")
         return False
 
+# 🔄 Generation calls are answered from the response cache unless the sidebar asks to regenerate
+def regenerate_requested():
+    return st.session_state.get("regenerate", False)
+
+# Longest text sent to Gemini for a mindmap
+MINDMAP_MAX_CHARS = 30000
+
 # Extract text from uploaded PDF file
-def extract_text_from_pdf(pdf_file):
-    """Extract text from uploaded PDF file."""
+def extract_text_from_pdf(pdf_file, max_chars=None):
+    """Extract text from uploaded PDF file, stopping once more than max_chars characters are read."""
     try:
-        pdf_reader = PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
+        page_texts = []
+        total_chars = 0
+        for page_text in iter_pdf_pages(pdf_file):
             if page_text:  # Only add non-empty pages
-                text += page_text + "\n"
+                page_texts.append(page_text)
+                total_chars += len(page_text) + 1
+            if max_chars is not None and total_chars > max_chars:
+                break  # the rest of the PDF is never parsed
+        text = "\n".join(page_texts)
         if not text.strip():
             st.warning("No text could be extracted from the PDF. Please ensure it's not scanned or image-based.")
             return None
@@ -73,8 +90,7 @@ def extract_text_from_pdf(pdf_file):
 def create_mindmap_markdown(text):
     """Generate mindmap markdown using Gemini AI."""
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        max_chars = 30000
+        max_chars = MINDMAP_MAX_CHARS
         if len(text) > max_chars:
             text = text[:max_chars] + "..."
             st.warning(f"Text was truncated to {max_chars} characters due to length limitations.")
@@ -97,7 +113,7 @@ def create_mindmap_markdown(text):
         Text to analyze: {text}
         Respond only with the markdown mindmap, no additional text.
         """
-        response = model.generate_content(prompt.format(text=text))
+        response = generate_content(prompt.format(text=text), regenerate=regenerate_requested())
         if not response.text or not response.text.strip():
             st.error("Received empty response from Gemini AI")
             return None
@@ -176,25 +192,106 @@ def play_audio_with_gtts(response_text):
     st.audio(temp_file.name, format="audio/mp3")
 
 # Extract text from PDF files
-def get_pdf_text(pdf_docs):
-    text = ""
-    for pdf in pdf_docs:
-        pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
-
-# Split large text into manageable chunks
-def get_text_chunks(text):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
-    chunks = text_splitter.split_text(text)
-    return chunks
-
-# Create vector store for fast similarity search
-def get_vector_store(text_chunks):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
+def get_pdf_pages(pdf_docs, progress_callback=None):
+    all_pages = []
+    for pages in extract_pages_from_pdfs(pdf_docs, progress_callback=progress_callback):
+        if isinstance(pages, Exception):
+            raise pages
+        all_pages.extend(pages)
+    return all_pages
+
+def get_pdf_text(pdf_docs, progress_callback=None):
+    return "".join(get_pdf_pages(pdf_docs, progress_callback))
+
+# Everything besides the PDF bytes that decides what a document's index contains
+INDEX_SETTINGS = (EMBEDDING_MODEL, CHUNK_LENGTH_MODE, CHUNK_CONFIGS["qa"], TOKEN_BUDGETS["qa"], DEDUP_THRESHOLD, VECTOR_PRECISION)
+
+# Create vector store for fast similarity search, saved under the document's own index ID
+def get_vector_store(doc_id, text_chunks, progress_callback=None):
+    # Chunks embedded before (in any session) come from the local embedding cache
+    embeddings = get_cached_embeddings()
+    # 🧬 Repeated boilerplate and near-identical versions are embedded once; the vector keeps
+    # the positions of every chunk it stands for in its metadata
+    unique_chunks, groups = deduplicate_chunks(text_chunks)
+    # Batches go out concurrently; rate-limited requests back off and lower the concurrency
+    vectors = embed_concurrently(embeddings.embed_documents, unique_chunks, progress_callback=progress_callback)
+    metadatas = [{"chunk_ids": group} for group in groups]
+    # Exact search for typical documents, IVF for very large ones (index_store.FAISS_INDEX_TYPE)
+    vector_store = build_vector_store(list(zip(unique_chunks, vectors)), embeddings, metadatas=metadatas)
+    # BM25 keyword index over the same chunks, saved next to the vectors; quantized indexes
+    # also keep the float32 vectors on disk to re-rank their top candidates
+    full_vectors = vectors if VECTOR_PRECISION != "float32" else None
+    index_store.save(doc_id, vector_store, keyword_index=KeywordIndex.build(unique_chunks), full_vectors=full_vectors)
+    return vector_store
+
+# Background job: extract -> chunk -> embed -> save, reporting progress on the job.
+# Every PDF gets its own index; the session only keeps the list of document IDs to search.
+def ingest_pdfs_job(job, pdf_files):
+    all_pages = extract_pages_from_pdfs(pdf_files, progress_callback=lambda done, total: job.update("Pages parsed", done, total))
+    # Chunks are offsets into one backing string per document, so the session holds about one
+    # copy of the text; a file's page list is dropped as soon as it is chunked
+    text_chunks = ChunkStore()
+    documents = []  # (doc_id, first chunk, end chunk) in text_chunks
+    for i, pdf_file in enumerate(pdf_files):
+        pages, all_pages[i] = all_pages[i], None
+        if isinstance(pages, Exception):
+            raise pages
+        job.update("Chunking", i, len(pdf_files))
+        first = len(text_chunks)
+        text_chunks.add_document("".join(pages), get_text_chunks(pages))
+        documents.append((document_index_id(pdf_fingerprint(pdf_file), *INDEX_SETTINGS), first, len(text_chunks)))
+        del pages
+    job.update("Chunking", len(pdf_files), len(pdf_files))
+
+    # Documents indexed before, by any session, are reused as they are
+    doc_ids = list(dict.fromkeys(doc_id for doc_id, first, end in documents if end > first))
+    to_index = {doc_id: (first, end) for doc_id, first, end in documents if end > first and not index_store.exists(doc_id)}
+    total = sum(end - first for first, end in to_index.values())
+    embedded = 0
+    for doc_id, (first, end) in to_index.items():
+        # Chunk strings are sliced out for one document at a time, only while it is embedded
+        get_vector_store(doc_id, text_chunks[first:end], progress_callback=lambda done, _: job.update("Chunks embedded", embedded + done, total))
+        embedded += end - first
+        job.update("Chunks embedded", embedded, total)
+    return {"text_chunks": text_chunks, "doc_ids": doc_ids}
+
+# Status of the current ingestion job. Only an unfinished job is polled: its fragment reruns every
+# second while the rest of the page stays usable, and sessions without one schedule nothing.
+def show_ingest_job_status():
+    job_id = st.session_state.get("ingest_job_id") or st.query_params.get("ingest_job")
+    job = get_job(job_id) if job_id else None
+    if job is None:
+        return
+    if job.finished:
+        render_ingest_job_status(job)
+    else:
+        poll_ingest_job_status(job)
+
+@st.fragment(run_every=1)
+def poll_ingest_job_status(job):
+    if job.finished:
+        st.rerun()  # a full run loads the results and stops the polling
+    render_ingest_job_status(job)
+
+def render_ingest_job_status(job):
+    if not job.finished:
+        st.info("⏳ Processing in the background — you can keep using the documents already loaded.")
+        for stage, (done, total) in job.progress_snapshot():
+            st.progress(done / total if total else 0.0, text=f"{stage}: {done}/{total}")
+        if st.button("Cancel Processing"):
+            job.cancel()
+    elif job.status == "done":
+        if st.session_state.get("loaded_job_id") != job.id:
+            # Swap the new documents in only once everything is indexed
+            st.session_state.text_chunks = job.result["text_chunks"]
+            st.session_state.doc_ids = job.result["doc_ids"]
+            st.session_state.loaded_job_id = job.id
+            st.rerun()
+        st.success("Processing complete! You can now interact with the chatbot, generate summaries, or create quiz questions.")
+    elif job.status == "failed":
+        st.error(f"Processing failed: {job.error}")
+    else:
+        st.warning("Processing cancelled.")
 
 # Define a conversational chain with the Google AI model
 def get_conversational_chain():
@@ -205,7 +302,7 @@ def get_conversational_chain():
     Question: {question}
     Answer:
     """
-    model = ChatGoogleGenerativeAI(model="gemini-pro", temperature=0.3)
+    model = llm_gateway.chat_model(temperature=0.3)  # one shared client for every question
     prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
     chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
     return chain
@@ -219,25 +316,17 @@ def load_google_api_key():
     return google_api_key
 
 def process_text(text):
-    # Split the text into chunks using Langchain's CharacterTextSplitter
-    text_splitter = CharacterTextSplitter(
-        separator="\n",
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    chunks = text_splitter.split_text(text)
+    # Split the text into chunks on newlines (same output as LangChain's CharacterTextSplitter)
+    text_splitter = get_text_splitter("knowledge_base")
+    chunks, groups = deduplicate_chunks(text_splitter.split_text(text))
 
     # Convert the chunks of text into embeddings to form a knowledge base
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")  # Use Google's embedding model
-    knowledgeBase = FAISS.from_texts(chunks, embeddings)
+    embeddings = get_cached_embeddings()  # Google's embedding model behind the local embedding cache
+    vectors = embed_concurrently(embeddings.embed_documents, chunks)
+    knowledgeBase = build_vector_store(list(zip(chunks, vectors)), embeddings, metadatas=[{"chunk_ids": group} for group in groups])
     return knowledgeBase
 
 def generate_summary_with_gemini(text, summary_type):
-    # Configure Google Generative AI with the API key
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-pro')
-
     # Define prompts based on the summary type
     if summary_type == "Short":
         prompt = f"""
@@ -260,21 +349,48 @@ def generate_summary_with_gemini(text, summary_type):
         The text is: ````{text}````
         """
 
-    try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        st.error(f"Error generating summary: {e}")
-        return ""
+    # Streamed, so the summary is shown while it is being written
+    return stream_content(prompt, regenerate=regenerate_requested())
 # Handle user input: Translate question, perform similarity search, and respond
+# ♻ The same question in the same language is translated once per process
+@lru_cache(maxsize=1024)
+def translate_question(question, source_language):
+    return GoogleTranslator(source=source_language, target="en").translate(question)
+
 def user_input(user_question, selected_language):
-    translated_question = GoogleTranslator(source=selected_language, target="en").translate(user_question)
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-    docs = new_db.similarity_search(translated_question)
-    chain = get_conversational_chain()
-    response = chain({"input_documents": docs, "question": translated_question}, return_only_outputs=True)
-    response_text = response["output_text"]
+    translated_question = translate_question(" ".join(user_question.split()), selected_language)
+    if not st.session_state.get("doc_ids"):
+        st.warning("Please upload and process PDF files first.")
+        return
+    embeddings = get_cached_embeddings()
+    # Only this session's documents are searched; their indexes stay loaded between questions
+    try:
+        new_db = index_store.load_view(st.session_state.doc_ids, embeddings)
+    except FileNotFoundError:
+        # The index cache was cleared or evicted since these PDFs were processed
+        st.session_state.doc_ids = []
+        st.warning("The processed documents are no longer available. Please re-process your PDFs.")
+        return
+    # Vector and keyword (BM25) results fused, so exact section numbers and codes are found too.
+    # A question asked before over the same indexes reuses its embedding and retrieved chunks.
+    # The question is embedded here once, within QUERY_EMBED_TIMEOUT, and the vector is reused below.
+    docs = new_db.hybrid_search(translated_question)
+    question_vector = new_db.query_vector
+    if new_db.keyword_only:
+        st.info("ℹ Semantic search is unavailable right now, so passages were matched by keywords only.")
+    # 💬 An equivalent question already answered over the same documents is answered from the cache;
+    # without the question's vector the cache is neither read nor written
+    fingerprint = document_set_fingerprint(st.session_state.doc_ids)
+    cached = answer_cache.lookup(fingerprint, translated_question, question_vector) if question_vector is not None else None
+    if cached is not None:
+        response_text = cached[1]
+        st.caption(f"💬 Answered from cache (similar to \"{cached[0]}\", similarity {cached[2]:.2f})")
+    else:
+        chain = get_conversational_chain()
+        response = llm_gateway.call(chain, {"input_documents": docs, "question": translated_question}, return_only_outputs=True)
+        response_text = response["output_text"]
+        if question_vector is not None:
+            answer_cache.store(fingerprint, translated_question, question_vector, response_text)
     print(response_text)
     reverse_translator = GoogleTranslator(source="en", target=selected_language)
     translated_response = reverse_translator.translate(response_text)
@@ -285,25 +401,24 @@ def user_input(user_question, selected_language):
     if st.button("Play Response (gTTS)"):
         play_audio_with_gtts(translated_response)
 
-# Split large text into manageable chunks
+# Split large text into manageable chunks (settings live in text_utils.CHUNK_CONFIGS)
 def get_text_chunks(text):
-    #text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    text_splitter = RecursiveCharacterTextSplitter()
-
-    chunks = text_splitter.split_text(text)
+    text_splitter = get_text_splitter("qa")
+    # Accept a stream of pages as well as one string, so the corpus never has to be joined first
+    pages = [text] if isinstance(text, str) else text
+    chunks = list(iter_text_chunks(pages, text_splitter, chunk_size=text_splitter.chunk_size))
     return chunks
 
 # Extract key topics from the text using Gemini AI
 def extract_key_topics(text_chunks):
     """Extract key topics or themes from the text using Gemini AI."""
     combined_text = " ".join(text_chunks)
-    model = genai.GenerativeModel('gemini-pro')
     prompt = """
     Extract the top 5 key topics or themes from the following text.
     Respond with a comma-separated list of topics.
     Text: {text}
     """
-    response = model.generate_content(prompt.format(text=combined_text))
+    response = generate_content(prompt.format(text=combined_text), regenerate=regenerate_requested())
     topics = [topic.strip() for topic in response.text.split(",")]
     return topics
 
@@ -355,8 +470,7 @@ def get_questions(text, num_questions=30):
     The text is: ````{text}````
     """
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(prompt)
+        response = generate_content(prompt, regenerate=regenerate_requested())
         # Parse the JSON response
         return json.loads(response.text)
     except Exception as e:
@@ -407,12 +521,8 @@ def generate_visual_summary(text_chunks):
 # Paraphrase text using Gemini AI
 def paraphrase_text(input_text):
     try:
-        paraphrasing_model = ChatGoogleGenerativeAI(
-            model="gemini-pro",
-            temperature=0.3,
-            max_output_tokens=300
-        )
-        response = paraphrasing_model.predict(text=input_text)
+        paraphrasing_model = llm_gateway.chat_model(temperature=0.3, max_output_tokens=300)
+        response = llm_gateway.call(paraphrasing_model.predict, text=input_text)
         return response
     except Exception as e:
         print(f"Error during paraphrasing: {e}")
@@ -514,13 +624,12 @@ def recommend_books(text_chunks):
         # Combine all text chunks into a single string
         combined_text = " ".join(text_chunks)
         # Use Gemini AI to extract key topics
-        model = genai.GenerativeModel('gemini-pro')
         prompt = """
         Extract the top 3 key topics or themes from the following text. 
         Respond with a comma-separated list of topics.
         Text: {text}
         """
-        response = model.generate_content(prompt.format(text=combined_text))
+        response = generate_content(prompt.format(text=combined_text), regenerate=regenerate_requested())
         topics = [topic.strip() for topic in response.text.split(",")]
         # Fetch dynamic book recommendations using Google Books API
         recommended_books = fetch_book_recommendations(topics)
@@ -578,8 +687,6 @@ def main():
         }
         selected_language = st.sidebar.selectbox("Select Language", options=list(language_options.keys()))
         selected_language_code = language_options[selected_language]
-        if "raw_text" not in st.session_state:
-            st.session_state.raw_text = None
         if "text_chunks" not in st.session_state:
             st.session_state.text_chunks = None
         if "quiz_questions" not in st.session_state:
@@ -588,13 +695,33 @@ def main():
         st.title("📁 PDF File's Section")
         pdf_docs = st.file_uploader("Upload your PDF Files and Click on the Submit & Process Button", accept_multiple_files=True)
         if st.button("Submit & Process"):
-            with st.spinner("Processing..."):
-                raw_text = get_pdf_text(pdf_docs)
-                text_chunks = get_text_chunks(raw_text)
-                get_vector_store(text_chunks)
-                st.session_state.raw_text = raw_text
-                st.session_state.text_chunks = text_chunks
-                st.success("Processing complete! You can now interact with the chatbot, generate summaries, or create quiz questions.")
+            if pdf_docs:
+                # Read the uploads here: the job thread cannot touch Streamlit objects
+                job = submit_job("Processing", ingest_pdfs_job, [pdf.getvalue() for pdf in pdf_docs])
+                st.session_state.ingest_job_id = job.id
+                st.query_params["ingest_job"] = job.id  # survives a browser refresh
+            else:
+                st.error("Please upload PDF files first.")
+        show_ingest_job_status()
+        cache_stats = pdf_text_cache.stats()
+        st.caption(f"🗄 PDF text cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+                   f"{cache_stats['entries']} files, {cache_stats['size_bytes'] / 1024 / 1024:.1f} of {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        embedding_stats = embedding_cache.stats()
+        st.caption(f"🧮 Embedding cache: {embedding_stats['hit_rate']:.0%} hit rate ({embedding_stats['hits']} hits / "
+                   f"{embedding_stats['misses']} misses), {embedding_stats['entries']} vectors")
+        retrieval_stats = retrieval_cache.stats()
+        st.caption(f"♻ Retrieval cache: {retrieval_stats['hit_rate']:.0%} hit rate, {retrieval_stats['entries']} questions")
+        answer_stats = answer_cache.stats()
+        st.caption(f"💬 Answer cache: {answer_stats['hit_rate']:.0%} hit rate ({answer_stats['hits']} hits / "
+                   f"{answer_stats['misses']} misses, {answer_stats['expired']} expired), {answer_stats['answers']} answers")
+        response_stats = response_cache.stats()
+        st.caption(f"📝 Response cache: {response_stats['hit_rate']:.0%} hit rate, {response_stats['entries']} responses, "
+                   f"{response_stats['size_bytes'] / 1024 / 1024:.1f} of {response_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        st.checkbox("🔄 Regenerate AI results (skip the response cache)", key="regenerate")
+        gateway_stats = llm_gateway.stats()
+        if gateway_stats["avg_total_seconds"]:
+            st.caption(f"⏱ Gemini calls: first words after {gateway_stats['avg_first_token_seconds']:.1f}s, "
+                       f"complete after {gateway_stats['avg_total_seconds']:.1f}s on average")
         st.write("---")
         st.title("📊 Visual Summary")
         if st.button("Generate Visual Summary"):
@@ -638,12 +765,15 @@ def main():
     )
     if st.button("Generate Summary"):
         if st.session_state.text_chunks:
-            with st.spinner("Generating summary..."):
-                combined_text = " ".join(st.session_state.text_chunks)
-                summary = generate_summary_with_gemini(combined_text, summary_type)
-                if summary:
-                    st.subheader(f'{summary_type} Summary Results:')
-                    st.write(summary)
+            combined_text = " ".join(st.session_state.text_chunks)
+            stream = generate_summary_with_gemini(combined_text, summary_type)
+            st.subheader(f'{summary_type} Summary Results:')
+            try:
+                st.write_stream(stream)
+                st.caption(f"⏱ First words after {stream.timing.first_token_seconds:.1f}s, "
+                           f"complete after {stream.timing.total_seconds:.1f}s")
+            except Exception as e:
+                st.error(f"Error generating summary: {e}")
         else:
             st.error("Please process PDFs first.")
 
@@ -677,7 +807,7 @@ def main():
     uploaded_file = st.file_uploader("Choose a PDF file", type="pdf")
     if uploaded_file is not None:
         with st.spinner("🔄 Processing PDF and generating mindmap..."):
-            text = extract_text_from_pdf(uploaded_file)
+            text = extract_text_from_pdf(uploaded_file, max_chars=MINDMAP_MAX_CHARS)
             if text:
                 st.info(f"Successfully extracted {len(text)} characters from PDF")
                 markdown_content = create_mindmap_markdown(text)
@@ -720,13 +850,12 @@ def main():
         with st.spinner("Fetching relevant links..."):
             if st.session_state.text_chunks:
                 combined_text = " ".join(st.session_state.text_chunks)
-                model = genai.GenerativeModel('gemini-pro')
                 prompt = """
                 Extract the top 3 key topics or themes from the following text.
                 Respond with a comma-separated list of topics.
                 Text: {text}
                 """
-                response = model.generate_content(prompt.format(text=combined_text))
+                response = generate_content(prompt.format(text=combined_text), regenerate=regenerate_requested())
                 topics = [topic.strip() for topic in response.text.split(",")]
                 all_links = []
                 for topic in topics:
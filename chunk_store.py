@@ -0,0 +1,155 @@
+import os
+import json
+import mmap
+from array import array
+from collections.abc import Sequence
+
+
+class ChunkStore(Sequence):
+    """
+    Chunks kept as (document, start, end) offsets into one backing string per document.
+    Behaves like the list of chunk strings the pages already read from
+    st.session_state.text_chunks (len, indexing, iteration, " ".join(...)), but a chunk's
+    text is only sliced out when it is accessed, so overlapping chunks cost no extra memory.
+    """
+
+    def __init__(self):
+        self.documents = []  # backing text, one string per document
+        self._rewritten = []  # chunks that could not be located in their document
+        self._doc_ids = array("l")
+        self._starts = array("q")
+        self._ends = array("q")
+
+    @classmethod
+    def from_chunks(cls, text, chunks):
+        store = cls()
+        store.add_document(text, chunks)
+        return store
+
+    def add_document(self, text, chunks=None, spans=None):
+        """
+        Add a document and its chunks, given either as spans [(start, end), ...] or as
+        chunk strings, which are located in the text in order.
+        :return: The document id.
+        """
+        doc_id = len(self.documents)
+        self.documents.append(text)
+        if spans is not None:
+            for start, end in spans:
+                self._append(doc_id, start, end)
+            return doc_id
+        search_from = 0
+        for chunk in chunks if chunks is not None else [text]:
+            start = text.find(chunk, search_from)
+            if start == -1:
+                # The splitter rewrote this chunk (e.g. joined pieces with a different separator):
+                # keep it as its own small backing string so nothing is lost
+                self._rewritten.append(chunk)
+                self._append(-len(self._rewritten), 0, len(chunk))
+                continue
+            self._append(doc_id, start, start + len(chunk))
+            search_from = start + 1
+        return doc_id
+
+    def _append(self, doc_id, start, end):
+        self._doc_ids.append(doc_id)
+        self._starts.append(start)
+        self._ends.append(end)
+
+    def span(self, index):
+        """Return (document id, start, end) of a chunk; a negative id marks a rewritten chunk."""
+        return self._doc_ids[index], self._starts[index], self._ends[index]
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        doc_id, start, end = self.span(index)
+        return self._buffer(doc_id)[start:end]
+
+    def __iter__(self):
+        for doc_id, start, end in zip(self._doc_ids, self._starts, self._ends):
+            yield self._buffer(doc_id)[start:end]
+
+    def _buffer(self, doc_id):
+        return self.documents[doc_id] if doc_id >= 0 else self._rewritten[-doc_id - 1]
+
+    def text(self, separator=" "):
+        """The documents joined once, without the overlap the chunks share."""
+        return separator.join(self.documents)
+
+    def nbytes(self):
+        """Approximate memory held: backing text plus the offset arrays."""
+        offsets = sum(a.itemsize * len(a) for a in (self._doc_ids, self._starts, self._ends))
+        return sum(len(text) for text in self.documents + self._rewritten) + offsets
+
+
+# 🗺 On-disk columns: a blob plus an int64 offsets file per column, memory-mapped when read
+def write_column(prefix, items):
+    """Write byte strings as prefix.bin (concatenated) and prefix.idx (item start offsets + end)."""
+    offsets = array("q", [0])
+    with open(prefix + ".bin", "wb") as f:
+        for item in items:
+            f.write(item)
+            offsets.append(offsets[-1] + len(item))
+    with open(prefix + ".idx", "wb") as f:
+        offsets.tofile(f)
+
+
+def map_file(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MappedColumn(Sequence):
+    """Read-only sequence of the byte strings written by write_column(); opening is O(1)."""
+
+    def __init__(self, prefix):
+        self._blob = map_file(prefix + ".bin")
+        self._offsets = memoryview(map_file(prefix + ".idx")).cast("q")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        return self._blob[self._offsets[index]:self._offsets[index + 1]]
+
+
+def write_mapped_chunks(path, texts, metadatas):
+    """Write chunk texts and their (JSON-serialisable) metadata as columns under path."""
+    write_column(os.path.join(path, "texts"), (text.encode("utf-8") for text in texts))
+    write_column(os.path.join(path, "metadata"),
+                 (json.dumps(metadata, separators=(",", ":")).encode("utf-8") for metadata in metadatas))
+
+
+class MappedChunks(Sequence):
+    """
+    Read-only chunks written by write_mapped_chunks(). Opening only maps the files, so it takes
+    the same time for ten chunks or a million, and a chunk is decoded (and its pages read from
+    disk) only when it is accessed.
+    """
+
+    def __init__(self, path):
+        self._texts = MappedColumn(os.path.join(path, "texts"))
+        self._metadata = MappedColumn(os.path.join(path, "metadata"))
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._texts[index].decode("utf-8")
+
+    def metadata(self, index):
+        return json.loads(self._metadata[index])
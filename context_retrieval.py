@@ -0,0 +1,80 @@
+import os
+import hashlib
+from chunk_store import ChunkStore
+from dedup import deduplicate_chunks
+from embedding_executor import embed_concurrently
+from index_store import IndexView, build_vector_store
+from keyword_index import KeywordIndex
+from text_utils import approx_token_count, get_text_splitter
+
+# 🎯 Tokens of retrieved PDF text sent with each question, and the size below which the
+# whole text is sent instead (retrieval cannot save anything on a document that small)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+FULL_TEXT_MAX_TOKENS = int(os.getenv("FULL_TEXT_MAX_TOKENS", "3000"))
+CONTEXT_FETCH_K = 12
+
+
+def source_texts(texts):
+    """
+    The PDF text behind st.session_state.text_chunks, without overlap: app.py keeps a ChunkStore
+    of overlapping chunks, whose documents are each PDF's text once; HomeMenu keeps full texts.
+    Splitting the overlapping chunks again would index every overlap twice.
+    """
+    return list(texts.documents) if isinstance(texts, ChunkStore) else list(texts)
+
+
+def texts_fingerprint(texts):
+    """Identity of a session's PDF texts, to know when its retriever must be rebuilt."""
+    digest = hashlib.blake2b(digest_size=16)
+    for text in texts:
+        digest.update(hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+    return digest.hexdigest()
+
+
+def assemble_context(chunks, token_budget=CONTEXT_TOKEN_BUDGET, separator="\n\n"):
+    """
+    Join chunks, best first, while they fit in token_budget. A chunk that does not fit is
+    skipped rather than cut, so a smaller one further down can still use the space.
+    """
+    parts, used = [], 0
+    for chunk in chunks:
+        tokens = approx_token_count(chunk)
+        if used + tokens > token_budget:
+            continue
+        parts.append(chunk)
+        used += tokens
+    return separator.join(parts)
+
+
+class SessionRetriever:
+    """
+    Hybrid (vector + BM25) index over one session's PDF texts, built in memory from the Q&A
+    chunk configuration. Repeated and near-identical chunks are embedded once, and chunks
+    embedded before come from the embedding cache.
+    """
+
+    def __init__(self, texts, embeddings):
+        splitter = get_text_splitter("qa")
+        chunks = [chunk for text in texts for chunk in splitter.split_text(text)]
+        self.chunks, _ = deduplicate_chunks(chunks)
+        self.full_tokens = sum(approx_token_count(text) for text in texts)
+        self.view = None
+        self.full_text = " ".join(texts) if self.full_tokens <= FULL_TEXT_MAX_TOKENS else None
+        if self.full_text is None:
+            vectors = embed_concurrently(embeddings.embed_documents, self.chunks)
+            # Positional IDs, so keyword and vector hits refer to chunks the same way
+            store = build_vector_store(list(zip(self.chunks, vectors)), embeddings,
+                                       ids=[str(i) for i in range(len(self.chunks))])
+            self.view = IndexView([store], embeddings, [KeywordIndex.build(self.chunks)])
+
+    @property
+    def keyword_only(self):
+        """True when the last question was matched by keywords alone (its embedding was unavailable)."""
+        return self.view is not None and self.view.keyword_only
+
+    def context(self, question, token_budget=CONTEXT_TOKEN_BUDGET, k=CONTEXT_FETCH_K):
+        """The text to answer question from: the full text for tiny documents, else the best chunks."""
+        if self.view is None:
+            return self.full_text
+        documents = self.view.hybrid_search(question, k=k)
+        return assemble_context([document.page_content for document in documents], token_budget)
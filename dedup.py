@@ -0,0 +1,88 @@
+import os
+import hashlib
+import numpy as np
+
+# 🧬 Estimated Jaccard similarity above which two chunks count as the same text
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+# Character shingle length and MinHash layout (bands x rows = signature length)
+SHINGLE_CHARS = 9
+LSH_BANDS = 16
+LSH_ROWS = 4
+
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, 2**63, size=LSH_BANDS * LSH_ROWS, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2**63, size=LSH_BANDS * LSH_ROWS, dtype=np.uint64)
+
+
+def normalize_chunk(text):
+    return " ".join(text.lower().split())
+
+
+def minhash_signature(text):
+    """MinHash of the text's character shingles, computed with vectorised 64-bit hashing."""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < SHINGLE_CHARS:
+        codes = np.concatenate([codes, np.zeros(SHINGLE_CHARS - len(codes), dtype=np.uint64)])
+    count = len(codes) - SHINGLE_CHARS + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_CHARS):  # polynomial rolling hash, wrapping at 2**64
+        shingles = shingles * np.uint64(1000003) + codes[offset:offset + count]
+    shingles = np.unique(shingles)
+    # One multiply-add permutation per signature slot, keeping the minimum
+    return (np.outer(_PERM_A, shingles) + _PERM_B[:, None]).min(axis=1)
+
+
+class ChunkDeduplicator:
+    """
+    Finds exact (hash) and near (MinHash + LSH) duplicates among chunks added one by one.
+    add() returns the index of the first chunk the new one duplicates, or its own index.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self.count = 0
+        self._exact = {}  # digest of normalized text -> representative index
+        self._signatures = {}  # representative index -> MinHash signature
+        self._buckets = {}  # (band, band signature) -> [representative indices]
+
+    def add(self, text):
+        index = self.count
+        self.count += 1
+        normalized = normalize_chunk(text)
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+        if digest in self._exact:
+            return self._exact[digest]
+
+        signature = minhash_signature(normalized)
+        bands = [(band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()) for band in range(LSH_BANDS)]
+        candidates = {candidate for key in bands for candidate in self._buckets.get(key, ())}
+        for candidate in sorted(candidates):
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                self._exact[digest] = candidate
+                return candidate
+
+        self._exact[digest] = index
+        self._signatures[index] = signature
+        for key in bands:
+            self._buckets.setdefault(key, []).append(index)
+        return index
+
+
+def deduplicate_chunks(chunks, threshold=DEDUP_THRESHOLD):
+    """
+    Collapse exact and near-duplicate chunks before they are embedded.
+    :return: (unique chunks, groups) where groups[i] lists the indices of every original
+             chunk that unique chunk i stands for, its own index first.
+    """
+    deduplicator = ChunkDeduplicator(threshold)
+    group_of = {}
+    unique, groups = [], []
+    for index, chunk in enumerate(chunks):
+        representative = deduplicator.add(chunk)
+        if representative == index:
+            group_of[index] = len(unique)
+            unique.append(chunk)
+            groups.append([index])
+        else:
+            groups[group_of[representative]].append(index)
+    return unique, groups
@@ -0,0 +1,215 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+from array import array
+from langchain_core.embeddings import Embeddings
+
+# 🗄 Vectors already computed, keyed by (model, chunk hash), shared by every session and rebuild
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite3"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1000")) * 1024 * 1024
+# The cache's size is tracked as vectors are written and recounted from the table (which other
+# app processes also write to) every this many writes
+EMBEDDING_CACHE_RECOUNT_EVERY = 100
+
+# 🔌 Embedding provider: "google" (models/embedding-001) or "local" (offline hashing
+# vectorizer in local_embeddings.py, for machines without network access)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google")
+
+# SQLite limits the number of parameters in one statement
+_LOOKUP_BATCH = 500
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    SQLite table of float32 vectors keyed by (model, sha256 of the text).
+    One connection is shared by all threads (guarded by a lock); WAL mode lets several
+    app processes use the same file.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = None  # bytes of vectors in the table, as of the last recount plus writes since
+        self._entries = None
+        self._puts = 0
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (model, hash))"
+            )
+        return self._conn
+
+    def get_many(self, model, hashes):
+        """Return {hash: vector} for the hashes that are cached."""
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = hashes[start:start + _LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                )
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            self.hits += sum(1 for key in hashes if key in found)
+            self.misses += sum(1 for key in hashes if key not in found)
+        return found
+
+    def put_many(self, model, items):
+        """Store [(hash, vector), ...] and evict the oldest vectors if the cache grew too large."""
+        now = time.time()
+        rows = {key: array("f", vector).tobytes() for key, vector in items}
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # Vectors being replaced, so the tracked size stays right without a full scan
+                keys = list(rows)
+                replaced = []
+                for start in range(0, len(keys), _LOOKUP_BATCH):
+                    batch = keys[start:start + _LOOKUP_BATCH]
+                    replaced += conn.execute(
+                        f"SELECT LENGTH(vector) FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                        [model, *batch],
+                    ).fetchall()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, hash, vector, created_at) VALUES (?, ?, ?, ?)",
+                    [(model, key, blob, now) for key, blob in rows.items()],
+                )
+                self._puts += 1
+                if self._size is None or self._puts % EMBEDDING_CACHE_RECOUNT_EVERY == 0:
+                    self._recount(conn)
+                else:
+                    self._size += sum(len(blob) for blob in rows.values()) - sum(length for length, in replaced)
+                    self._entries += len(rows) - len(replaced)
+                if self._size > self.max_bytes:
+                    self._evict(conn)
+
+    def _recount(self, conn):
+        self._entries, self._size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+
+    def _evict(self, conn):
+        # Drop the oldest rows until the cache is back under 90% of its limit
+        excess = self._size - int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for rowid, length in conn.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY created_at"):
+            stale.append((rowid,))
+            freed += length
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM embeddings WHERE rowid = ?", stale)
+        self._size -= freed
+        self._entries -= len(stale)
+
+    def stats(self):
+        """Hit counts and the tracked size; the table is only counted on the first call."""
+        with self._lock:
+            if self._size is None:
+                self._recount(self._connection())
+            entries, size = self._entries, self._size
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+embedding_cache = EmbeddingCache()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any LangChain embeddings object: only texts missing from the cache reach the
+    wrapped model, so re-indexing a known document makes no API calls.
+    Queries and documents are cached separately because the model embeds them differently.
+    """
+
+    def __init__(self, embeddings, model_name="models/embedding-001", cache=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache or embedding_cache
+
+    def embed_documents(self, texts):
+        return self._embed(texts, f"{self.model_name}:document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], f"{self.model_name}:query", lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def _embed(self, texts, model, embed):
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(model, hashes)
+        missing = {}  # hash -> text, each distinct missing text sent once
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            # Rounded to float32 like cached vectors, so a rebuild returns exactly the same values
+            computed = [(key, array("f", vector).tolist()) for key, vector in zip(missing, embed(list(missing.values())))]
+            self.cache.put_many(model, computed)
+            vectors.update(computed)
+        return [vectors[key] for key in hashes]
+
+
+def create_embeddings(provider=None, **kwargs):
+    """A LangChain embeddings object for the provider; kwargs go to the Google client only."""
+    provider = provider or EMBEDDING_PROVIDER
+    if provider == "local":
+        from local_embeddings import HashingEmbeddings
+
+        return HashingEmbeddings()
+    if provider == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model="models/embedding-001", **kwargs)
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+def embedding_model_name(provider=None):
+    """Identifies the vectors a provider produces, for cache keys and index IDs."""
+    provider = provider or EMBEDDING_PROVIDER
+    if provider == "local":
+        from local_embeddings import LOCAL_EMBEDDING_DIM
+
+        return f"local/hashing-{LOCAL_EMBEDDING_DIM}"
+    return "models/embedding-001"
+
+
+EMBEDDING_MODEL = embedding_model_name()
+
+
+@lru_cache(maxsize=8)
+def get_cached_embeddings(provider=None, **kwargs):
+    """
+    The configured embeddings, one client per settings. API-backed providers sit behind the
+    shared embedding cache; the local one is cheaper to recompute than to look up.
+    """
+    provider = provider or EMBEDDING_PROVIDER
+    embeddings = create_embeddings(provider, **kwargs)
+    if provider == "local":
+        return embeddings
+    return CachedEmbeddings(embeddings, model_name=embedding_model_name(provider))
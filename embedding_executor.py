@@ -0,0 +1,124 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+# 🚀 Chunks per embedding request and requests allowed in flight at once
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# A batch that keeps getting rate limited is given up after this many attempts
+EMBED_MAX_ATTEMPTS = 8
+EMBED_BACKOFF_SECONDS = 1.0
+EMBED_MAX_BACKOFF_SECONDS = 30.0
+
+
+def is_rate_limited(error):
+    """
+    True for HTTP 429 / RESOURCE_EXHAUSTED errors from the embedding API, judged by the
+    exception's type or status code, also when a client library re-raised it wrapped in its own
+    error type. Error messages are not searched, so a "429" in a page or row count is no match.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        code = getattr(error, "code", None)
+        code = code() if callable(code) else code  # grpc errors expose code() as a method
+        if code == 429 or getattr(error, "status_code", None) == 429:
+            return True
+        if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+            return True
+        if getattr(code, "name", None) == "RESOURCE_EXHAUSTED":
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class AdaptiveConcurrency:
+    """
+    Additive-increase / multiplicative-decrease limit on requests in flight: every rate-limited
+    request halves the limit, every successful one raises it by 1/limit (about +1 per round of
+    requests), up to max_limit.
+    """
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.throttled = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, rate_limited=False):
+        with self._condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.throttled += 1
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+# Shared by every embedding job of this process, so concurrent sessions stay within one
+# EMBED_CONCURRENCY limit and a 429 seen by one slows all of them down
+embedding_limiter = AdaptiveConcurrency(EMBED_CONCURRENCY)
+_embed_executor = ThreadPoolExecutor(max_workers=max(1, EMBED_CONCURRENCY), thread_name_prefix="embed")
+
+
+def _embed_batch(embed, batch, limiter):
+    for attempt in range(EMBED_MAX_ATTEMPTS):
+        limiter.acquire()
+        try:
+            vectors = embed(batch)
+        except Exception as e:
+            limiter.release(rate_limited=is_rate_limited(e))
+            if not is_rate_limited(e) or attempt == EMBED_MAX_ATTEMPTS - 1:
+                raise
+            # Exponential backoff with full jitter so throttled workers do not retry in lockstep
+            time.sleep(random.uniform(0, min(EMBED_MAX_BACKOFF_SECONDS, EMBED_BACKOFF_SECONDS * 2 ** attempt)))
+            continue
+        limiter.release()
+        return vectors
+
+
+def embed_concurrently(embed, texts, batch_size=EMBED_BATCH_SIZE, max_in_flight=None, progress_callback=None):
+    """
+    Embed texts in batches with several requests in flight, backing off on rate limits.
+    :param embed: Callable list of texts -> list of vectors (e.g. embeddings.embed_documents).
+    :param max_in_flight: None shares embedding_limiter and the module's worker pool with every
+                          other caller; a number uses a limiter and pool of that size for this call only.
+    :param progress_callback: Called as (texts embedded, total) from the calling thread; an
+                              exception it raises (e.g. a cancelled job) stops the remaining batches.
+    :return: One vector per text, in order.
+    """
+    texts = list(texts)
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+    results = [None] * len(batches)
+    if max_in_flight is None:
+        limiter, executor = embedding_limiter, _embed_executor
+    else:
+        limiter = AdaptiveConcurrency(max_in_flight)
+        executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="embed")
+    futures = {}
+    try:
+        futures = {executor.submit(_embed_batch, embed, batch, limiter): i for i, batch in enumerate(batches)}
+        done = 0
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            done += len(batches[futures[future]])
+            if progress_callback:
+                progress_callback(done, len(texts))
+    finally:
+        # Batches not started yet are dropped; the ones in flight finish before this returns
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        if executor is not _embed_executor:
+            executor.shutdown(wait=True)
+    return [vector for batch_vectors in results for vector in batch_vectors]
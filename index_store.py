@@ -0,0 +1,741 @@
+import os
+import math
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from uuid import uuid4
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from dedup import ChunkDeduplicator
+from chunk_store import MappedChunks, write_mapped_chunks
+from keyword_index import KeywordIndex
+
+logger = logging.getLogger(__name__)
+
+# 📚 One FAISS index per document, stored under a content-addressed ID
+INDEX_DIR = os.getenv("FAISS_INDEX_DIR", os.path.join(".cache", "faiss_indexes"))
+# Disk space for those indexes; the least recently searched ones are deleted beyond it. The size
+# is tracked as indexes are saved and recounted from the directory every INDEX_DIR_RECOUNT_EVERY saves
+INDEX_DIR_MAX_BYTES = int(os.getenv("FAISS_INDEX_MAX_MB", "2048")) * 1024 * 1024
+INDEX_DIR_RECOUNT_EVERY = 20
+# Bumped whenever the on-disk layout changes, so older index directories are never read
+INDEX_FORMAT = 3
+# 🧠 Memory allowed for indexes kept loaded between questions, shared by all sessions
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_MB", "1024")) * 1024 * 1024
+# 🔎 Index type: "auto" picks one by vector count, or force flat / ivf_flat / hnsw / ivf_pq
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+# Vector counts at which "auto" moves from exact search to IVF-Flat, then to compressed IVF-PQ.
+# `python benchmarks.py ann_index` (100k clustered vectors): IVF-Flat keeps recall@10 at 1.0
+# for ~10x faster queries than flat; IVF-PQ trades recall (~0.66) for ~16x less memory, so it
+# is only picked once flat 768-dim vectors would need gigabytes.
+IVF_MIN_VECTORS = 20000
+IVF_PQ_MIN_VECTORS = 1000000
+# IVF and PQ codebooks are trained on a random sample of at most this many vectors
+TRAIN_SAMPLE_SIZE = 50000
+# Bits per PQ code; training a codebook needs at least 2 ** PQ_BITS vectors, so smaller
+# documents get IVF-Flat even when ivf_pq is forced
+PQ_BITS = 8
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 64
+# 🗜 How vectors are held in the index: float32, float16 or int8 (scalar-quantized). With the
+# smaller types, saved indexes keep the float32 vectors in a memory-mapped file and the top
+# RERANK_FACTOR * k candidates are re-scored against them at full precision.
+VECTOR_PRECISION = os.getenv("VECTOR_PRECISION", "float32")
+RERANK_FACTOR = 4
+_SCALAR_QUANTIZERS = {"float16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+# 🔀 Hybrid search: candidates taken from each retriever, and the reciprocal rank fusion constant
+HYBRID_FETCH_K = 20
+RRF_K = 60
+# ⏱ Seconds to wait for the question's embedding before answering from keywords alone
+QUERY_EMBED_TIMEOUT = float(os.getenv("QUERY_EMBED_TIMEOUT", "10"))
+# ♻ Questions whose embedding and retrieved chunks are remembered, shared by all sessions
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+# 🧹 Share of deleted entries in an incremental index that triggers a background compaction
+COMPACT_RATIO = float(os.getenv("INDEX_COMPACT_RATIO", "0.25"))
+# An incremental index that has grown to this many times the vectors its type was chosen and
+# trained on (IVF centroids, int8 ranges) is rebuilt: type re-chosen and retrained
+RETRAIN_GROWTH = 4
+
+
+def document_index_id(pdf_fingerprint, *settings):
+    """
+    ID of one document's index: the PDF's hash plus every setting that changes its chunks or
+    vectors, so the same file indexed the same way maps to the same directory for every user.
+    """
+    digest = hashlib.sha256(pdf_fingerprint.encode("utf-8"))
+    digest.update(f"format={INDEX_FORMAT}".encode("utf-8"))
+    for setting in settings:
+        digest.update(repr(setting).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def choose_index_type(count):
+    if count < IVF_MIN_VECTORS:
+        return "flat"
+    if count < IVF_PQ_MIN_VECTORS:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def build_faiss_index(vectors, index_type=None, precision=None):
+    """
+    A FAISS index (L2 distance, like the LangChain wrapper's default) holding the vectors.
+    HNSW is never picked automatically: at the sizes "auto" moves off exact search, IVF-Flat
+    already reaches full recall while HNSW's graph links take about half again the memory of
+    the vectors (see `python benchmarks.py ann_index`), but it can be forced for faster queries.
+    precision applies to flat, IVF-Flat and HNSW; IVF-PQ is compressed anyway.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    index_type = index_type or FAISS_INDEX_TYPE
+    if index_type == "auto":
+        index_type = choose_index_type(count)
+    if index_type == "ivf_pq" and count < 2 ** PQ_BITS:
+        index_type = "ivf_flat"
+    precision = precision or VECTOR_PRECISION
+    if precision not in ("float32", *_SCALAR_QUANTIZERS):
+        raise ValueError(f"Unknown vector precision: {precision}")
+    scalar_quantizer = _SCALAR_QUANTIZERS.get(precision)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim) if scalar_quantizer is None else faiss.IndexScalarQuantizer(dim, scalar_quantizer)
+    elif index_type == "hnsw":
+        if scalar_quantizer is None:
+            index = faiss.IndexHNSWFlat(dim, HNSW_NEIGHBORS)
+        else:
+            index = faiss.IndexHNSWSQ(dim, scalar_quantizer, HNSW_NEIGHBORS)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        # About 4 * sqrt(n) lists, with enough training points per list for k-means
+        nlist = max(1, min(int(4 * math.sqrt(count)), count // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat" and scalar_quantizer is not None:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, scalar_quantizer)
+        elif index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            # About 4 dimensions per sub-quantizer (at most 64 of them), PQ_BITS bits per code
+            subquantizers = max(m for m in range(1, max(1, min(64, dim // 4)) + 1) if dim % m == 0)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, subquantizers, PQ_BITS)
+        sample = vectors
+        if count > TRAIN_SAMPLE_SIZE:
+            sample = vectors[np.random.default_rng(0).choice(count, TRAIN_SAMPLE_SIZE, replace=False)]
+        index.train(sample)
+        index.nprobe = max(8, nlist // 16)
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+    if not index.is_trained:  # int8 learns each dimension's range
+        index.train(vectors if count <= TRAIN_SAMPLE_SIZE else
+                    vectors[np.random.default_rng(0).choice(count, TRAIN_SAMPLE_SIZE, replace=False)])
+    index.add(vectors)
+    return index
+
+
+def build_vector_store(text_embeddings, embeddings, metadatas=None, ids=None, index_type=None, precision=None):
+    """Like FAISS.from_embeddings, but on the index type and precision chosen by build_faiss_index()."""
+    texts, vectors = zip(*text_embeddings)
+    ids = ids or [uuid4().hex for _ in texts]
+    metadatas = metadatas or [{} for _ in texts]
+    docstore = InMemoryDocstore({id_: Document(id=id_, page_content=text, metadata=metadata)
+                                 for id_, text, metadata in zip(ids, texts, metadatas)})
+    return FAISS(embeddings, build_faiss_index(vectors, index_type, precision), docstore, dict(enumerate(ids)))
+
+
+class MappedDocstore:
+    """Docstore over MappedChunks: the document ID is the chunk's position in the index."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def search(self, search):
+        position = int(search)
+        return Document(id=search, page_content=self.chunks[position], metadata=self.chunks.metadata(position))
+
+
+class PositionalIds(Mapping):
+    """index_to_docstore_id for MappedDocstore (position i -> "i") without building a dict."""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise KeyError(index)
+        return str(index)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+
+class LoadedIndexCache:
+    """
+    Process-wide LRU of loaded indexes, bounded by their size on disk (which is close
+    to what they take in memory). An entry is only reused while the directory it was loaded
+    from is unchanged; a replaced or deleted index is loaded again.
+    """
+
+    def __init__(self, max_bytes=INDEX_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # path -> (signature, store, nbytes)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(path):
+        """
+        Identity of an index directory: its inode (renames swap it) and its files' sizes and mtimes.
+        Raises FileNotFoundError when the directory no longer exists (e.g. the cache was cleared).
+        """
+        files = tuple(sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns) for entry in os.scandir(path)))
+        return os.stat(path).st_ino, files
+
+    def get(self, path, load):
+        try:
+            signature = self.signature(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)  # never serve an index whose files are gone
+            raise
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        # Loaded outside the lock so one slow load does not hold up other sessions' questions
+        store = load()
+        nbytes = sum(size for _, size, _ in signature[1])
+        with self._lock:
+            self._entries[path] = (signature, store, nbytes)
+            self._entries.move_to_end(path)
+            self._evict()
+        return store
+
+    def _evict(self):
+        while len(self._entries) > 1 and sum(entry[2] for entry in self._entries.values()) > self.max_bytes:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "size_bytes": sum(entry[2] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+
+def normalize_query(query):
+    """Questions that differ only in case or spacing share cache entries."""
+    return " ".join(query.casefold().split())
+
+
+class QueryCache:
+    """Thread-safe LRU of up to max_entries values, with hit and miss counts."""
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "hit_rate": self.hits / total if total else 0.0}
+
+
+# (embedding model, normalized question) -> query vector
+query_embedding_cache = QueryCache()
+# (index version, normalized question, k, fetch_k) -> [(store number, chunk ID), ...]
+retrieval_cache = QueryCache()
+
+
+# A document's loaded FAISS store, its keyword index and its memory-mapped full-precision
+# vectors (None for stores saved without them)
+LoadedIndex = namedtuple("LoadedIndex", ["store", "keywords", "vectors"])
+
+_query_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-embed")
+
+
+class IndexView:
+    """
+    Searches several per-document stores as one index. The query is embedded once and each
+    store's nearest chunks are merged by distance (all stores use the same embedding model
+    and L2 distance), so the cached stores are never modified or copied.
+    Stores with quantized vectors return RERANK_FACTOR times more candidates, which are
+    re-scored against their full-precision vectors before merging.
+    version identifies the indexes' contents (see IndexStore.load_view); views with a version
+    share hybrid search results for repeated questions through retrieval_cache.
+    keyword_only is True when the last hybrid search had to run without the query embedding;
+    otherwise query_vector holds that embedding, so callers never embed the question twice.
+    """
+
+    def __init__(self, stores, embeddings, keyword_indexes=None, full_vectors=None, version=None):
+        self.stores = stores
+        self.embeddings = embeddings
+        self.keyword_indexes = keyword_indexes or [None] * len(stores)
+        self.full_vectors = full_vectors or [None] * len(stores)
+        self.version = version
+        self.keyword_only = False
+        self.query_vector = None
+
+    def _embedding_key(self, query):
+        return getattr(self.embeddings, "model_name", type(self.embeddings).__name__), normalize_query(query)
+
+    def embed_query(self, query):
+        """
+        The question's vector, from query_embedding_cache when it was asked before. The
+        normalised question is only the cache key; the model embeds the question as asked.
+        """
+        key = self._embedding_key(query)
+        vector = query_embedding_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            query_embedding_cache.put(key, vector)
+        return vector
+
+    def _vector_hits(self, vector, k):
+        """(squared L2 distance, store number, document) for each store's k nearest chunks."""
+        hits = []
+        for i, (store, full_vectors) in enumerate(zip(self.stores, self.full_vectors)):
+            if full_vectors is None:
+                pairs = store.similarity_search_with_score_by_vector(vector, k=k)
+            else:
+                candidates = [document for document, _ in
+                              store.similarity_search_with_score_by_vector(vector, k=k * RERANK_FACTOR)]
+                rows = full_vectors[[int(document.id) for document in candidates]]
+                distances = ((rows - np.asarray(vector, dtype=np.float32)) ** 2).sum(axis=1)
+                pairs = sorted(zip(candidates, distances.tolist()), key=lambda pair: pair[1])[:k]
+            hits += [(score, i, document) for document, score in pairs]
+        return hits
+
+    def similarity_search_with_score(self, query, k=4):
+        hits = sorted(self._vector_hits(self.embed_query(query), k), key=lambda hit: hit[0])
+        return [(document, score) for score, _, document in hits[:k]]
+
+    def similarity_search(self, query, k=4):
+        return [document for document, _ in self.similarity_search_with_score(query, k=k)]
+
+    def _keyword_ranking(self, query, fetch_k):
+        """
+        The fetch_k best BM25 hits over all documents, as (store number, chunk id). Hits are
+        ordered by their rank within their own document (reciprocal rank fusion of the
+        per-document rankings); equal ranks go to the hit closest to its document's top score.
+        """
+        hits = []
+        for i, keywords in enumerate(self.keyword_indexes):
+            if keywords is None:
+                continue
+            ranked = keywords.search(query, k=fetch_k)
+            for rank, (position, score) in enumerate(ranked):
+                hits.append((rank, -score / ranked[0][1] if ranked[0][1] > 0 else 0.0, i, str(position)))
+        return [(i, doc_id) for _, _, i, doc_id in sorted(hits)[:fetch_k]]
+
+    def hybrid_search(self, query, k=4, fetch_k=HYBRID_FETCH_K):
+        """
+        Fuse vector and BM25 keyword results with reciprocal rank fusion, so exact section
+        numbers, codes and acronyms are found even when their embeddings are not close.
+        If embedding the query fails or takes longer than QUERY_EMBED_TIMEOUT, the keyword
+        results are used alone (and not cached), keyword_only is set and query_vector is None.
+        BM25 scores are not comparable between documents, so each document's keyword hits are
+        ranked on their own and the per-document rankings are fused first.
+        """
+        self.keyword_only = False
+        self.query_vector = None
+        cache_key = (self.version, normalize_query(query), k, fetch_k) if self.version is not None else None
+        best = retrieval_cache.get(cache_key) if cache_key is not None else None
+        if best is not None:
+            # Results are only cached when the question was embedded, so its vector is usually cached too
+            self.query_vector = query_embedding_cache.get(self._embedding_key(query))
+            return [self.stores[i].docstore.search(doc_id) for i, doc_id in best]
+
+        rankings = [self._keyword_ranking(query, fetch_k)]
+        try:
+            vector = _query_executor.submit(self.embed_query, query).result(timeout=QUERY_EMBED_TIMEOUT)
+        except Exception as e:
+            logger.warning("Query embedding unavailable, using keyword search only: %r", e)
+            self.keyword_only = True
+        else:
+            self.query_vector = vector
+            vector_hits = sorted(self._vector_hits(vector, fetch_k), key=lambda hit: hit[0])
+            rankings.append([(i, document.id) for _, i, document in vector_hits[:fetch_k]])
+
+        fused = {}
+        for ranking in rankings:
+            for rank, key in enumerate(ranking):
+                fused[key] = fused.get(key, 0.0) + 1 / (RRF_K + rank + 1)
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        if cache_key is not None and len(rankings) == 2:
+            retrieval_cache.put(cache_key, best)
+        return [self.stores[i].docstore.search(doc_id) for i, doc_id in best]
+
+
+class IndexStore:
+    """
+    Per-document FAISS indexes on disk. An index directory only ever appears complete: it is
+    written to a temporary directory next to it and renamed into place, so concurrent sessions
+    never read a half-written index or overwrite each other's.
+    Each directory holds the FAISS index plus the chunks as memory-mapped columns (see
+    chunk_store.write_mapped_chunks) instead of LangChain's pickled docstore, so loading never
+    unpickles anything and reads only the chunks a search returns. Quantized indexes are
+    saved with their float32 vectors in vectors.f32, memory-mapped for re-ranking.
+    Like the PDF, embedding and response caches, the directory is bounded (max_bytes): once
+    saves take it past the limit, the least recently searched indexes are deleted.
+    """
+
+    def __init__(self, root=INDEX_DIR, cache=None, max_bytes=INDEX_DIR_MAX_BYTES):
+        self.root = root
+        self.cache = cache or LoadedIndexCache()
+        self.max_bytes = max_bytes
+        self._size = None  # bytes of saved indexes, as of the last recount plus saves since
+        self._saves = 0
+        self._lock = threading.Lock()
+
+    def path(self, doc_id):
+        return os.path.join(self.root, doc_id)
+
+    def exists(self, doc_id):
+        return os.path.isdir(self.path(doc_id))
+
+    def save(self, doc_id, vector_store, keyword_index=None, full_vectors=None):
+        final_path = self.path(doc_id)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=f".{doc_id}.", dir=self.root)
+        try:
+            self._write(tmp_path, vector_store)
+            if keyword_index is not None:
+                keyword_index.save(tmp_path)
+            if full_vectors is not None:
+                np.asarray(full_vectors, dtype=np.float32).tofile(os.path.join(tmp_path, "vectors.f32"))
+            os.rename(tmp_path, final_path)
+        except OSError:
+            # Another session saved this document first; same ID means the same content
+            if not self.exists(doc_id):
+                raise
+            return final_path
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        with self._lock:
+            self._saves += 1
+            if self._size is None or self._saves % INDEX_DIR_RECOUNT_EVERY == 0:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += self._dir_size(final_path)
+            if self._size > self.max_bytes:
+                self._evict(keep=doc_id)
+        return final_path
+
+    @staticmethod
+    def _dir_size(path):
+        try:
+            return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        except OSError:
+            return 0
+
+    def _entries(self):
+        """(last used, bytes, doc_id) of every saved index; temporary directories are skipped."""
+        entries = []
+        try:
+            scanned = list(os.scandir(self.root))
+        except OSError:
+            return entries
+        for entry in scanned:
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, self._dir_size(entry.path), entry.name))
+            except OSError:
+                continue
+        return entries
+
+    def _evict(self, keep):
+        # Drop the least recently used indexes until the directory is back under 90% of its limit;
+        # a session still searching one is asked to re-process its PDFs (see load_view)
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, doc_id in sorted(entries):
+            if total <= self.max_bytes * 0.9:
+                break
+            if doc_id == keep:
+                continue
+            shutil.rmtree(self.path(doc_id), ignore_errors=True)
+            total -= size
+        self._size = total
+
+    @staticmethod
+    def _write(path, vector_store):
+        faiss.write_index(vector_store.index, os.path.join(path, "index.faiss"))
+        documents = [vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+                     for i in range(vector_store.index.ntotal)]
+        write_mapped_chunks(path, [document.page_content for document in documents],
+                            [document.metadata for document in documents])
+
+    def load(self, doc_id, embeddings):
+        path = self.path(doc_id)
+        chunks = MappedChunks(path)
+        return FAISS(embeddings, faiss.read_index(os.path.join(path, "index.faiss")),
+                     MappedDocstore(chunks), PositionalIds(len(chunks)))
+
+    def load_keywords(self, doc_id):
+        path = self.path(doc_id)
+        return KeywordIndex.load(path) if os.path.exists(os.path.join(path, "keywords.json")) else None
+
+    def load_full_vectors(self, doc_id, dim):
+        path = os.path.join(self.path(doc_id), "vectors.f32")
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        return np.memmap(path, dtype=np.float32, mode="r").reshape(-1, dim)
+
+    def _load_index(self, doc_id, embeddings):
+        store = self.load(doc_id, embeddings)
+        return LoadedIndex(store, self.load_keywords(doc_id), self.load_full_vectors(doc_id, store.index.d))
+
+    def get_index(self, doc_id, embeddings):
+        """A document's LoadedIndex from the loaded-index cache, read from disk only when needed."""
+        try:
+            os.utime(self.path(doc_id))  # mark as recently used for eviction
+        except FileNotFoundError:
+            pass  # reported by the cache lookup below
+        return self.cache.get(self.path(doc_id), lambda: self._load_index(doc_id, embeddings))
+
+    def get(self, doc_id, embeddings):
+        return self.get_index(doc_id, embeddings).store
+
+    def load_view(self, doc_ids, embeddings):
+        """
+        One searchable index over a session's documents. Raises FileNotFoundError when one of
+        them is no longer on disk (the index directory was cleared or evicted).
+        """
+        if not doc_ids:
+            raise ValueError("No documents have been processed yet")
+        indexes = [self.get_index(doc_id, embeddings) for doc_id in doc_ids]
+        # A rebuilt or replaced index directory changes its signature, and with it the version
+        version = tuple((doc_id, self.cache.signature(self.path(doc_id))) for doc_id in doc_ids)
+        return IndexView([index.store for index in indexes], embeddings, [index.keywords for index in indexes],
+                         [index.vectors for index in indexes], version)
+
+
+index_store = IndexStore()
+
+
+def is_lossy(index):
+    """True when vectors read back from the index differ from those added (scalar-quantized or PQ)."""
+    return not isinstance(index, (faiss.IndexFlat, faiss.IndexIVFFlat, faiss.IndexHNSWFlat))
+
+
+class IncrementalIndex:
+    """
+    In-memory FAISS store that documents are added to and removed from one at a time.
+    Adding a document appends vectors and docstore entries for its new chunks only; chunks that
+    duplicate a live entry (from any document) just add a source reference to it. Removing a
+    document drops its references, and entries nobody references any more are marked deleted:
+    searches skip them, and compact() rebuilds the FAISS index without them on a background
+    thread once they make up compact_ratio of it.
+    The index type and its training come from the vectors the index was built from, so once it
+    holds RETRAIN_GROWTH times as many, compaction also re-chooses the type and retrains.
+    Compaction re-adds the live vectors at full precision: they are read back from lossless
+    indexes, and kept as float32 next to scalar-quantized and PQ ones (like IndexStore's
+    vectors.f32), so repeated compactions never quantize already quantized vectors.
+    """
+
+    def __init__(self, embeddings, compact_ratio=COMPACT_RATIO):
+        self.embeddings = embeddings
+        self.compact_ratio = compact_ratio
+        self.store = None
+        self._names = {}  # document key -> display name, in the order documents were added
+        self._doc_entries = {}  # document key -> entry ids it references
+        self._sources = {}  # live entry id -> [(document key, chunk index), ...]
+        self._removed = set()  # entries still in the FAISS index but no longer referenced
+        self._dedup = ChunkDeduplicator()
+        self._entry_of = {}  # deduplicator representative -> entry id
+        self._lock = threading.RLock()
+        self._compaction = None
+        self._trained_size = 0  # vectors the current index type and training were chosen for
+        self._full_vectors = None  # entry id -> float32 vector, only while the index is lossy
+
+    def document_keys(self):
+        return list(self._names)
+
+    def __len__(self):
+        return len(self._sources)
+
+    def add_document(self, key, chunks, vectors=None, name=None, embed=None):
+        """
+        Index one document's chunks; a known key is ignored. Chunks are deduplicated against
+        every chunk indexed before (and each other) by the index's own deduplicator, and only
+        those that match no live entry need a vector: either precomputed in vectors, or computed
+        by embed(list of texts) for just those chunks. If embed raises, nothing is added.
+        :return: The number of new entries.
+        """
+        with self._lock:
+            if key in self._names:
+                return 0
+            new_ids, new_positions, referenced, pending = [], [], [], {}
+            for i, chunk in enumerate(chunks):
+                representative = self._dedup.add(chunk)
+                entry_id = self._entry_of.get(representative)
+                if entry_id not in self._sources:  # unseen chunk, or its entry was deleted
+                    entry_id = pending.get(representative)
+                    if entry_id is None:
+                        entry_id = pending[representative] = uuid4().hex
+                        new_ids.append(entry_id)
+                        new_positions.append(i)
+                referenced.append(entry_id)
+            new_texts = [chunks[i] for i in new_positions]
+            if vectors is not None:
+                new_vectors = [vectors[i] for i in new_positions]
+            else:
+                new_vectors = embed(new_texts) if new_texts else []
+            new_pairs = list(zip(new_texts, new_vectors))
+            self._entry_of.update(pending)
+            for i, entry_id in enumerate(referenced):
+                self._sources.setdefault(entry_id, []).append((key, i))
+            self._names[key] = name or key
+            self._doc_entries[key] = list(dict.fromkeys(referenced))
+            if new_pairs:
+                if self.store is None:
+                    self.store = build_vector_store(new_pairs, self.embeddings, ids=new_ids)
+                    self._trained_size = len(new_pairs)
+                    self._full_vectors = {} if is_lossy(self.store.index) else None
+                else:
+                    self.store.add_embeddings(new_pairs, ids=new_ids)
+                if self._full_vectors is not None:
+                    self._full_vectors.update((id_, np.asarray(vector, dtype=np.float32))
+                                              for id_, (_, vector) in zip(new_ids, new_pairs))
+                if self._needs_retrain(self.store.index.ntotal):
+                    self.compact(background=True)
+            return len(new_pairs)
+
+    def _needs_retrain(self, count):
+        return count > RETRAIN_GROWTH * self._trained_size
+
+    def remove_document(self, key):
+        """Forget a document; nothing is re-embedded or rebuilt until compaction."""
+        with self._lock:
+            if key not in self._names:
+                return
+            del self._names[key]
+            for entry_id in self._doc_entries.pop(key):
+                sources = [source for source in self._sources[entry_id] if source[0] != key]
+                if sources:
+                    self._sources[entry_id] = sources
+                else:
+                    del self._sources[entry_id]
+                    self._removed.add(entry_id)
+            if self.store is not None and len(self._removed) > self.compact_ratio * self.store.index.ntotal:
+                self.compact(background=True)
+
+    def compact(self, background=False):
+        """Rebuild the FAISS index without deleted entries, on a copy so searches keep working."""
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            if background:
+                self._compaction = threading.Thread(target=self._compact, name="index-compaction", daemon=True)
+                self._compaction.start()
+                return
+        self._compact()
+
+    def _compact(self):
+        with self._lock:
+            store, removed = self.store, set(self._removed)
+            if store is None or not (removed or self._needs_retrain(store.index.ntotal)):
+                return
+            # Live rows go into a fresh index at full precision rather than being deleted in
+            # place: IVF indexes keep the deleted rows' ids, which would no longer match positions
+            snapshot_size = store.index.ntotal
+            ids = [store.index_to_docstore_id[i] for i in range(snapshot_size)]
+            vectors = self._source_vectors(store, ids, 0)
+            documents = {id_: store.docstore.search(id_) for id_ in ids if id_ not in removed}
+        live = [i for i, id_ in enumerate(ids) if id_ not in removed]
+        live_ids = [ids[i] for i in live]
+        retrain, trained = self._needs_retrain(len(live)), len(live)
+        if not live:
+            copy = None
+        elif retrain:
+            copy = build_vector_store([(documents[id_].page_content, vectors[i]) for i, id_ in zip(live, live_ids)],
+                                      self.embeddings, ids=live_ids)
+        else:
+            index = faiss.clone_index(store.index)  # keeps the type and training, drops nothing else
+            index.reset()
+            index.add(np.ascontiguousarray(vectors[live]))
+            copy = FAISS(self.embeddings, index, InMemoryDocstore(documents), dict(enumerate(live_ids)))
+        with self._lock:
+            # Chunks added while the copy was compacted are carried over from the live store
+            added, added_vectors = [], []
+            if store.index.ntotal > snapshot_size:
+                added = [store.index_to_docstore_id[i] for i in range(snapshot_size, store.index.ntotal)]
+                added_vectors = self._source_vectors(store, added, snapshot_size)
+                pairs = [(store.docstore.search(id_).page_content, vector) for id_, vector in zip(added, added_vectors)]
+                if copy is None:
+                    copy = build_vector_store(pairs, self.embeddings, ids=added)
+                    retrain, trained = True, len(added)
+                else:
+                    copy.add_embeddings(pairs, ids=added)
+            if copy is not None and is_lossy(copy.index):
+                self._full_vectors = {**{ids[i]: vectors[i] for i in live}, **dict(zip(added, added_vectors))}
+            else:
+                self._full_vectors = None
+            self.store = copy
+            if retrain:
+                self._trained_size = trained
+            self._removed -= removed
+
+    def _source_vectors(self, store, ids, start):
+        """float32 vectors of the index rows from start on: kept ones for a lossy index, else read back."""
+        if self._full_vectors is not None:
+            return np.array([self._full_vectors[id_] for id_ in ids], dtype=np.float32).reshape(len(ids), -1)
+        return store.index.reconstruct_n(start, len(ids))
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4):
+        store, removed = self.store, len(self._removed)
+        if store is None:
+            return []
+        results = []
+        # Fetch past deleted entries that may still rank first
+        for document, score in store.similarity_search_with_score_by_vector(embedding, k=k + removed):
+            sources = self._sources.get(document.id)
+            if sources is None:
+                continue
+            metadata = {"sources": [{"file": self._names[key], "chunk": i} for key, i in sources]}
+            results.append((Document(id=document.id, page_content=document.page_content, metadata=metadata), score))
+        return results[:k]
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k=k)
+
+    def similarity_search(self, query, k=4):
+        return [document for document, _ in self.similarity_search_with_score(query, k=k)]
@@ -0,0 +1,109 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ⚙ Ingestion jobs that may run at the same time across all sessions
+JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+# 🧹 Finished jobs are forgotten after this many seconds
+JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL", "3600"))
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="ingest-job")
+
+
+# Derives from BaseException (like asyncio.CancelledError) so per-file `except Exception`
+# handlers inside a job cannot swallow a cancellation
+class JobCancelled(BaseException):
+    pass
+
+
+class Job:
+    """State of one background job, shared between the worker thread and any Streamlit rerun."""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = "queued"  # queued -> running -> done / failed / cancelled
+        self.stage = None
+        self.progress = {}  # stage name -> (done, total), in the order stages started
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def update(self, stage, done, total):
+        """Record progress for a stage; raises JobCancelled once cancel() was requested."""
+        self.check_cancelled()
+        with self._lock:
+            self.stage = stage
+            self.progress[stage] = (done, total)
+
+    def progress_snapshot(self):
+        """[(stage, (done, total)), ...] copied under the lock, safe to iterate while the job runs."""
+        with self._lock:
+            return list(self.progress.items())
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.status = "cancelled"  # never started
+            self.finished_at = time.time()
+
+
+def _run_job(job, func, args, kwargs):
+    if job._cancel_event.is_set():
+        # Cancelled after the worker took the job but before it started: future.cancel() failed
+        job.status = "cancelled"
+        job.finished_at = time.time()
+        return
+    job.status = "running"
+    try:
+        job.result = func(job, *args, **kwargs)
+        job.status = "done"
+    except JobCancelled:
+        job.status = "cancelled"
+    except Exception as e:
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        job.finished_at = time.time()
+
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_TTL_SECONDS
+    with _jobs_lock:
+        for job_id in [job_id for job_id, job in _jobs.items() if job.finished and job.finished_at < cutoff]:
+            del _jobs[job_id]
+
+
+def submit_job(name, func, *args, **kwargs):
+    """
+    Run func(job, *args, **kwargs) on the background executor.
+    func reports progress with job.update(...) and must not call Streamlit itself.
+    :return: The Job; keep job.id (e.g. in st.query_params) to find it again after a refresh.
+    """
+    _prune_jobs()
+    job = Job(name)
+    with _jobs_lock:
+        _jobs[job.id] = job
+    job.future = _job_executor.submit(_run_job, job, func, args, kwargs)
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
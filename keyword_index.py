@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from chunk_store import MappedColumn, map_file, write_column
+
+# 🔤 Words, numbers and codes; "4.2.1", "AB-123" and "i/o" stay whole so they can match exactly
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-/]\w+)*")
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """Lowercased tokens; a compound token such as "ab-123" is also indexed as its parts."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[.\-/]", token) if part)
+    return tokens
+
+
+def encode_varints(numbers):
+    out = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            out.append((number & 0x7F) | 0x80)
+            number >>= 7
+        out.append(number)
+    return bytes(out)
+
+
+def decode_varints(data):
+    numbers = []
+    number = shift = 0
+    for byte in data:
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = shift = 0
+    return numbers
+
+
+class KeywordIndex:
+    """
+    BM25 over an inverted index of chunk tokens. Terms are kept sorted (looked up with bisect)
+    and each term's postings are varint-encoded (chunk position gap, term frequency) pairs, so
+    the saved index is compact and, like the chunk columns, opens without being read.
+    Chunk positions are the same as in the FAISS index built from the same chunk list.
+    """
+
+    def __init__(self, terms, postings, doc_lengths, avg_length):
+        self.terms = terms  # sorted byte strings
+        self.postings = postings  # encoded postings, aligned with terms
+        self.doc_lengths = doc_lengths
+        self.avg_length = avg_length
+
+    @classmethod
+    def build(cls, chunks):
+        doc_lengths = array("l")
+        term_postings = {}
+        for position, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                term_postings.setdefault(term, []).append((position, count))
+        terms = sorted(term_postings)
+        postings = []
+        for term in terms:
+            numbers, previous = [], 0
+            for position, count in term_postings[term]:
+                numbers += (position - previous, count)
+                previous = position
+            postings.append(encode_varints(numbers))
+        avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        return cls([term.encode("utf-8") for term in terms], postings, doc_lengths, avg_length)
+
+    def save(self, path):
+        write_column(os.path.join(path, "terms"), self.terms)
+        write_column(os.path.join(path, "postings"), self.postings)
+        with open(os.path.join(path, "doc_lengths.bin"), "wb") as f:
+            array("q", self.doc_lengths).tofile(f)
+        with open(os.path.join(path, "keywords.json"), "w") as f:
+            json.dump({"avg_length": self.avg_length}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "keywords.json")) as f:
+            avg_length = json.load(f)["avg_length"]
+        doc_lengths = memoryview(map_file(os.path.join(path, "doc_lengths.bin"))).cast("q")
+        return cls(MappedColumn(os.path.join(path, "terms")), MappedColumn(os.path.join(path, "postings")),
+                   doc_lengths, avg_length)
+
+    def _postings(self, term):
+        key = term.encode("utf-8")
+        i = bisect_left(self.terms, key)
+        if i == len(self.terms) or self.terms[i] != key:
+            return []
+        numbers = decode_varints(self.postings[i])
+        positions, position = [], 0
+        for gap in numbers[0::2]:
+            position += gap
+            positions.append(position)
+        return list(zip(positions, numbers[1::2]))
+
+    def search(self, query, k=20):
+        """Return up to k (chunk position, BM25 score) pairs, best first. No network calls."""
+        count = len(self.doc_lengths)
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[position] / (self.avg_length or 1))
+                scores[position] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores.most_common(k)
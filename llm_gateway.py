@@ -0,0 +1,282 @@
+import os
+import time
+import random
+import logging
+import threading
+from itertools import chain
+from collections import deque, namedtuple
+from embedding_executor import is_rate_limited
+from response_cache import CachedResponse, prompt_key, response_cache
+
+logger = logging.getLogger(__name__)
+
+# 🤖 The Gemini model every page and app.py generate with
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+# 🚦 Requests per minute allowed to start (shared by all sessions of this process), and how many
+# may start back to back after a quiet period
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_BURST = 5
+# Rate-limited or temporarily failing calls are retried this many times in all
+LLM_MAX_ATTEMPTS = 6
+LLM_BACKOFF_SECONDS = 1.0
+LLM_MAX_BACKOFF_SECONDS = 30.0
+# Timings of the most recent generations, kept for the stats
+LLM_TIMINGS_KEPT = 500
+
+# ⏱ One generation: seconds until the first text arrived and until the last (the same for calls
+# that are not streamed)
+GenerationTiming = namedtuple("GenerationTiming", ["model", "first_token_seconds", "total_seconds", "characters", "cached"])
+
+
+def is_retryable(error):
+    """Rate limits and temporary server errors (500, 503, 504) are worth another attempt."""
+    if is_rate_limited(error):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code in (500, 503, 504):
+        return True
+    message = f"{type(error).__name__} {error}"
+    return any(name in message for name in ("ServiceUnavailable", "DeadlineExceeded", "InternalServerError"))
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket that starts requests at up to `rate` per second. A quota response halves the
+    rate and empties the bucket; every successful request adds back a small step (about +10% of
+    max_rate per 10 requests) until max_rate is reached again.
+    """
+
+    def __init__(self, max_rate, burst=LLM_BURST, min_rate=None):
+        self.max_rate = max_rate
+        self.min_rate = min_rate or max_rate / 64
+        self.rate = max_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may start."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+    def on_rate_limited(self):
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+
+def _result_text(result):
+    """Text of a non-streamed result: a string, a chain's output dict, or a response/message."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, dict):
+        return "".join(value for value in result.values() if isinstance(value, str))
+    try:
+        text = getattr(result, "text", None) or getattr(result, "content", None)
+    except ValueError:  # blocked responses raise on .text
+        return ""
+    return text if isinstance(text, str) else ""
+
+
+def _chunk_text(chunk):
+    try:
+        return chunk.text
+    except ValueError:  # a chunk without text parts (e.g. only safety ratings)
+        return ""
+
+
+class ResponseStream:
+    """
+    Text of one generation as it arrives, for st.write_stream. The request starts when
+    iteration starts and is retried by the gateway until the first chunk arrives; once the
+    stream is consumed, text and timing are set and the text is cached.
+    """
+
+    def __init__(self, gateway, name, prompt, key, regenerate, kwargs):
+        self.gateway = gateway
+        self.name = name
+        self.prompt = prompt
+        self.key = key
+        self.regenerate = regenerate
+        self.kwargs = kwargs
+        self.text = None
+        self.timing = None
+
+    def _start(self):
+        chunks = iter(self.gateway.model(self.name).generate_content(self.prompt, stream=True, **self.kwargs))
+        return next(chunks, None), chunks
+
+    def __iter__(self):
+        start = time.perf_counter()
+        first_token = None
+        cache = self.gateway.cache
+        cached = cache.get(self.key) if cache is not None and not self.regenerate else None
+        pieces = [cached] if cached is not None else []
+        if cached is not None:
+            first_token = time.perf_counter() - start
+            yield cached
+        else:
+            first, chunks = self.gateway._retry(self._start)
+            for chunk in chain([first] if first is not None else [], chunks):
+                piece = _chunk_text(chunk)
+                if not piece:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                pieces.append(piece)
+                yield piece
+        self.text = "".join(pieces)
+        total = time.perf_counter() - start
+        self.timing = GenerationTiming(self.name, first_token if first_token is not None else total, total,
+                                       len(self.text), cached is not None)
+        self.gateway.record(self.timing)
+        if cached is None and cache is not None and self.text:
+            cache.put(self.key, self.text)
+
+
+class LLMGateway:
+    """
+    The one place Gemini is called from. Model clients are created once per model (and
+    settings, for LangChain chat models) and shared; every request waits for the adaptive
+    token bucket and is retried with jittered exponential backoff on quota and server errors.
+    """
+
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE, max_attempts=LLM_MAX_ATTEMPTS, cache=response_cache):
+        self.limiter = AdaptiveTokenBucket(requests_per_minute / 60)
+        self.max_attempts = max_attempts
+        self.cache = cache
+        self.calls = 0
+        self.retries = 0
+        self.timings = deque(maxlen=LLM_TIMINGS_KEPT)
+        self._models = {}
+        self._chat_models = {}
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def model(self, name=None):
+        """The shared genai.GenerativeModel for name (default: GEMINI_MODEL)."""
+        name = name or GEMINI_MODEL
+        with self._lock:
+            if name not in self._models:
+                import google.generativeai as genai
+
+                if not self._configured:
+                    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                    self._configured = True
+                self._models[name] = genai.GenerativeModel(name)
+            return self._models[name]
+
+    def chat_model(self, name=None, temperature=0.3, **kwargs):
+        """
+        The shared LangChain ChatGoogleGenerativeAI for these settings, for chains. Its own
+        retries are off (max_retries=0): call() already retries, and both together would
+        multiply the attempts a quota error causes.
+        """
+        kwargs.setdefault("max_retries", 0)
+        key = (name or GEMINI_MODEL, temperature, tuple(sorted(kwargs.items())))
+        with self._lock:
+            if key not in self._chat_models:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                self._chat_models[key] = ChatGoogleGenerativeAI(model=key[0], temperature=temperature, **kwargs)
+            return self._chat_models[key]
+
+    def call(self, func, *args, **kwargs):
+        """
+        Run one API request through the rate limiter, retrying quota and server errors. The
+        call is timed like a generation whose first token arrives with the last.
+        """
+        start = time.perf_counter()
+        result = self._retry(func, *args, **kwargs)
+        total = time.perf_counter() - start
+        self.record(GenerationTiming(getattr(func, "__name__", type(func).__name__), total, total,
+                                     len(_result_text(result)), False))
+        return result
+
+    def _retry(self, func, *args, **kwargs):
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if is_rate_limited(e):
+                    self.limiter.on_rate_limited()
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                self.retries += 1
+                # Full jitter, so sessions throttled together do not retry in lockstep
+                time.sleep(random.uniform(0, min(LLM_MAX_BACKOFF_SECONDS, LLM_BACKOFF_SECONDS * 2 ** attempt)))
+                continue
+            self.limiter.on_success()
+            self.calls += 1
+            return result
+
+    def generate_content(self, prompt, model=None, regenerate=False, **kwargs):
+        """
+        Generate with the shared model. The same prompt with the same settings is answered from
+        the response cache; regenerate=True skips the lookup and replaces the cached text.
+        """
+        start = time.perf_counter()
+        name = model or GEMINI_MODEL
+        key = prompt_key(name, prompt, kwargs)
+        if self.cache is not None and not regenerate:
+            text = self.cache.get(key)
+            if text is not None:
+                total = time.perf_counter() - start
+                self.record(GenerationTiming(name, total, total, len(text), True))
+                return CachedResponse(text)
+        response = self._retry(self.model(name).generate_content, prompt, **kwargs)
+        text = _result_text(response)
+        total = time.perf_counter() - start
+        self.record(GenerationTiming(name, total, total, len(text), False))
+        # Blocked or empty responses have no text and are not cached
+        if self.cache is not None and text:
+            self.cache.put(key, text)
+        return response
+
+    def stream_content(self, prompt, model=None, regenerate=False, **kwargs):
+        """Like generate_content(), but returns a ResponseStream that yields text as it is generated."""
+        name = model or GEMINI_MODEL
+        return ResponseStream(self, name, prompt, prompt_key(name, prompt, kwargs), regenerate, kwargs)
+
+    def record(self, timing):
+        self.timings.append(timing)
+        logger.info("%s: first token %.2fs, total %.2fs, %d characters%s", timing.model, timing.first_token_seconds,
+                    timing.total_seconds, timing.characters, " (cached)" if timing.cached else "")
+
+    def stats(self):
+        generated = [timing for timing in list(self.timings) if not timing.cached]
+        return {"calls": self.calls, "retries": self.retries, "throttled": self.limiter.throttled,
+                "requests_per_minute": self.limiter.rate * 60,
+                "avg_first_token_seconds": sum(t.first_token_seconds for t in generated) / len(generated) if generated else 0.0,
+                "avg_total_seconds": sum(t.total_seconds for t in generated) / len(generated) if generated else 0.0}
+
+
+llm_gateway = LLMGateway()
+
+
+def generate_content(prompt, model=None, regenerate=False, **kwargs):
+    """Shortcut for llm_gateway.generate_content()."""
+    return llm_gateway.generate_content(prompt, model, regenerate, **kwargs)
+
+
+def stream_content(prompt, model=None, regenerate=False, **kwargs):
+    """Shortcut for llm_gateway.stream_content()."""
+    return llm_gateway.stream_content(prompt, model, regenerate, **kwargs)
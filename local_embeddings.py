@@ -0,0 +1,42 @@
+import os
+import re
+import zlib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# 🖥 Size of the local hashing embeddings (768 matches models/embedding-001)
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "768"))
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Offline embeddings: words and word pairs are hashed (crc32, stable across processes) into
+    `dim` signed buckets, counts are log-scaled and every vector is L2-normalised. A batch is
+    accumulated into one NumPy matrix, so embedding thousands of chunks takes well under a
+    second and needs no network. Texts sharing vocabulary get similar vectors, which is enough
+    to exercise ingestion, retrieval and benchmarks end to end; it is not a semantic model.
+    """
+
+    def __init__(self, dim=LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            words = WORD_PATTERN.findall(text.lower())
+            features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+            hashes.append(np.fromiter(map(zlib.crc32, map(str.encode, features)), dtype=np.uint32, count=len(features)))
+            rows.append(np.full(len(features), row, dtype=np.int64))
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if hashes:
+            hashes = np.concatenate(hashes)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix, (np.concatenate(rows), (hashes % self.dim).astype(np.int64)), signs)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return matrix.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
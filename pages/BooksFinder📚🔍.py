@@ -1,11 +1,8 @@
 import streamlit as st
 import os
 import requests
-import google.generativeai as genai
-import time
 from utils2 import translate_text  # Import translation function
-# Configure Google Gemini AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from llm_gateway import generate_content  # Shared Gemini client, rate limiting and retries
 # Load custom CSS
 def load_css():
     with open("styles.css") as f:
@@ -46,11 +43,9 @@ def fetch_book_recommendations(topics):
     return recommended_books
 
 # Function to extract key topics using AI
-def extract_key_topics():
+def extract_key_topics(regenerate=False):
     try:
-        time.sleep(1.5)
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        response = model.generate_content(f"Extract the top 3 key topics or themes from this text: {st.session_state.text_chunks}")
+        response = generate_content(f"Extract the top 3 key topics or themes from this text: {' '.join(st.session_state.text_chunks)}", regenerate=regenerate)
         topics = [topic.strip() for topic in response.text.split(",")]
         return topics
     except Exception as e:
@@ -79,9 +74,10 @@ def recommend_books():
         st.warning(translate_text("⚠ Please upload PDFs on the Home page first!"))
         return
 
-    # **Extract topics**
+    # **Extract topics** (unchanged PDFs are answered from the response cache)
+    regenerate = st.checkbox(translate_text("🔄 Regenerate (ignore the cached result)"))
     with st.spinner(translate_text("🔍 Extracting key topics...")):
-        topics = extract_key_topics()
+        topics = extract_key_topics(regenerate)
     
     if not topics:
         st.error(translate_text("⚠ AI could not determine relevant topics. Try uploading another PDF."))
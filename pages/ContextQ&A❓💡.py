@@ -1,8 +1,11 @@
 import streamlit as st
-import google.generativeai as genai
 import os
 import time
 from utils2 import translate_text  # Import translation function
+from llm_gateway import stream_content  # Shared Gemini client, rate limiting, retries and caching
+from context_retrieval import SessionRetriever, source_texts, texts_fingerprint
+from embedding_cache import get_cached_embeddings
+from text_utils import approx_token_count
 
 # Load CSS
 def load_css():
@@ -11,22 +14,18 @@ def load_css():
 
 load_css()
 
-# Configure Google Gemini AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# 🎯 Hybrid (vector + keyword) index over the uploaded PDFs, rebuilt only when they change
+def get_retriever(texts):
+    texts = source_texts(texts)
+    fingerprint = texts_fingerprint(texts)
+    if st.session_state.get("qa_retriever_fingerprint") != fingerprint:
+        st.session_state.qa_retriever = SessionRetriever(texts, get_cached_embeddings(google_api_key=os.getenv("GOOGLE_API_KEY")))
+        st.session_state.qa_retriever_fingerprint = fingerprint
+    return st.session_state.qa_retriever
 
-# Function to generate AI-powered answers
-def generate_answer(question, context):
-    try:
-        time.sleep(1.5)
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        response = model.generate_content(f"Based on this PDF content, provide an accurate answer to: {question}\n\n{context}")
-
-        if response.text:
-            return response.text.strip()
-        else:
-            return translate_text("⚠ AI could not generate a response. Try rephrasing your question.")
-    except Exception as e:
-        return f"{translate_text('❌ Error')}: {str(e)}"
+# Function to generate AI-powered answers (streamed as they are written)
+def generate_answer(question, context, regenerate=False):
+    return stream_content(f"Based on this PDF content, provide an accurate answer to: {question}\n\n{context}", regenerate=regenerate)
 
 # Main Q&A Page
 def answer():
@@ -49,19 +48,50 @@ def answer():
     with col2:
         st.image("img/q&a.jpg", width=200)  # Add a related image/icon
 
-    # Generate answer button
+    # Generate answer button (the same question over the same passages comes from the response cache)
+    regenerate = st.checkbox(translate_text("🔄 Regenerate (ignore the cached result)"))
     if st.button(translate_text("🔍 Get Answer")):
         if not question.strip():
             st.error(translate_text("⚠ Please enter a valid question."))
             return
 
         with st.spinner(translate_text("Thinking... 🤖")):
-            pdf_text = " ".join(st.session_state.text_chunks)  # Combine all uploaded PDF text
-            answer = generate_answer(question, pdf_text)
+            # Only the chunks most relevant to the question are sent, within a token budget
+            start = time.perf_counter()
+            try:
+                retriever = get_retriever(st.session_state.text_chunks)
+                context = retriever.context(question)
+            except Exception as e:
+                st.error(f"{translate_text('❌ Error')}: {str(e)}")
+                return
+            retrieval_time = time.perf_counter() - start
+        if retriever.keyword_only:
+            st.info(translate_text("ℹ Semantic search is unavailable right now, so passages were matched by keywords only."))
+        if not context or not context.strip():
+            # Nothing relevant was found: Gemini would only be asked to answer without any PDF text
+            st.warning(translate_text("⚠ AI could not generate a response. Try rephrasing your question."))
+            return
 
-        # Display answer in a clean format
+        # Display the answer as it is generated; other languages get the translation once it is complete
         st.success(translate_text("✅ AI Answer:"))
-        st.markdown(f"<div style='padding:10px; border-radius:8px;'> {translate_text(answer)} </div>", unsafe_allow_html=True)
+        placeholder = st.empty()
+        stream = generate_answer(question, context, regenerate)
+        try:
+            placeholder.write_stream(stream)
+        except Exception as e:
+            placeholder.error(f"{translate_text('❌ Error')}: {str(e)}")
+            return
+        answer = stream.text.strip()
+        if not answer:
+            placeholder.warning(translate_text("⚠ AI could not generate a response. Try rephrasing your question."))
+            return
+        if st.session_state.get("selected_language", "en") != "en":
+            placeholder.markdown(translate_text(answer))
+        context_tokens = approx_token_count(context)
+        st.caption(f"⏱ Retrieval {retrieval_time:.2f}s, first words {stream.timing.first_token_seconds:.2f}s, "
+                   f"answer {stream.timing.total_seconds:.2f}s · "
+                   f"📉 {context_tokens:,.0f} of {retriever.full_tokens:,.0f} PDF tokens sent "
+                   f"({1 - context_tokens / max(retriever.full_tokens, 1):.0%} saved)")
 
 if __name__ == "__main__":
     answer()
@@ -1,12 +1,8 @@
 import streamlit as st
-import google.generativeai as genai
 import streamlit.components.v1 as components
-import os
-import time
 from utils2 import translate_text  # Import translation function
-
-# Configure Gemini AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from llm_gateway import generate_content  # Shared Gemini client, rate limiting and retries
+from text_utils import join_prefix
 
 # Load Custom CSS
 def load_css():
@@ -15,13 +11,14 @@ def load_css():
 
 load_css()
 
+# Longest text sent to Gemini for a mindmap
+MINDMAP_MAX_CHARS = 30000
+
 # Generate mindmap markdown using Gemini AI
-def create_mindmap_markdown(text):
+def create_mindmap_markdown(text, regenerate=False):
     """Generate mindmap markdown using Gemini AI."""
     try:
-        time.sleep(1.5)  # Prevent excessive API calls
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        max_chars = 30000
+        max_chars = MINDMAP_MAX_CHARS
         if len(text) > max_chars:
             text = text[:max_chars] + "..."
             st.warning(translate_text(f"⚠ Text truncated to {max_chars} characters due to length limitations."))
@@ -46,7 +43,7 @@ def create_mindmap_markdown(text):
         Respond only with the markdown mindmap, no additional text.
         """
 
-        response = model.generate_content(prompt.format(text=text))
+        response = generate_content(prompt.format(text=text), regenerate=regenerate)
         
         if not response.text or not response.text.strip():
             st.error(translate_text("⚠ Received empty response from Gemini AI"))
@@ -138,10 +135,11 @@ def mindmap():
     with col2:
         st.image("/Users/varshininaravula/Downloads/Multi-PDFs_ChatApp_AI-Agent-main/img/mindmap.webp", width=200, caption=translate_text("AI-Generated Mind Map"))  # Adjust path & size
 
-    # **Button to Generate Mind Map**
+    # **Button to Generate Mind Map** (unchanged PDFs are answered from the response cache)
+    regenerate = st.checkbox(translate_text("🔄 Regenerate (ignore the cached result)"))
     if st.button(translate_text("✨ Generate Mind Map")):
         with st.spinner(translate_text("🧠 Thinking... Generating Mind Map...")):
-            markdown_content = create_mindmap_markdown(" ".join(st.session_state.text_chunks))
+            markdown_content = create_mindmap_markdown(join_prefix(st.session_state.text_chunks, MINDMAP_MAX_CHARS), regenerate)
             
             if markdown_content:
                 html_content = create_markmap_html(markdown_content)
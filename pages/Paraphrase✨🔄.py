@@ -1,13 +1,9 @@
 import streamlit as st
-import google.generativeai as genai
-import os
 import base64
-import time
 from utils2 import translate_text  # Import translation function
+from llm_gateway import stream_content  # Shared Gemini client, rate limiting, retries and caching
 import tempfile
 from gtts import gTTS
-# Configure Google Gemini AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 # Load Custom CSS
 def load_css():
@@ -25,19 +21,9 @@ def play_text_as_audio(text, language_code="en"):
     except Exception as e:
         st.error(f"❌ Error generating audio: {str(e)}")
 
-# **Function to Generate AI-Powered Paraphrased Text**
-def generate_paraphrase(text):
-    try:
-        time.sleep(1.5)
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        response = model.generate_content(f"Paraphrase the following text in a clearer and more professional manner:\n\n{text}")
-
-        if response.text:
-            return response.text.strip()
-        else:
-            return translate_text("⚠ AI could not generate a paraphrase. Try again with different input.")
-    except Exception as e:
-        return f"❌ {translate_text('Error')}: {str(e)}"
+# **Function to Generate AI-Powered Paraphrased Text** (streamed as it is written)
+def generate_paraphrase(text, regenerate=False):
+    return stream_content(f"Paraphrase the following text in a clearer and more professional manner:\n\n{text}", regenerate=regenerate)
 
 # **Function to Create a Downloadable Text File**
 def create_download_link(paraphrased_text):
@@ -69,18 +55,28 @@ def paraphrase():
 
     st.write("---")
     
-    # **Generate paraphrase button**
+    # **Generate paraphrase button** (text paraphrased before is answered from the response cache)
+    regenerate = st.checkbox(translate_text("🔄 Regenerate (ignore the cached result)"))
     if st.button(translate_text("🔄 Paraphrase")):
         if not text.strip():
             st.error(translate_text("⚠ Please enter valid text to paraphrase."))
             return
 
-        with st.spinner(translate_text("Paraphrasing... 🔄")):
-            paraphrased_text = generate_paraphrase(text)
+        stream = generate_paraphrase(text, regenerate)
 
-        # **Display paraphrased text in a styled box**
+        # **Display paraphrased text as it is generated**
         st.success(translate_text("✅ AI-Paraphrased Text:"))
-        st.markdown(f"<div style='padding:10px; border-radius:8px;'> {paraphrased_text} </div>", unsafe_allow_html=True)
+        try:
+            st.write_stream(stream)
+        except Exception as e:
+            st.error(f"❌ {translate_text('Error')}: {str(e)}")
+            return
+        paraphrased_text = stream.text.strip()
+        if not paraphrased_text:
+            st.warning(translate_text("⚠ AI could not generate a paraphrase. Try again with different input."))
+            return
+        st.caption(f"⏱ {translate_text('First words after')} {stream.timing.first_token_seconds:.1f}s, "
+                   f"{translate_text('complete after')} {stream.timing.total_seconds:.1f}s")
 
         # **Copy & Download options**
         col_copy, col_download = st.columns([1, 1])
@@ -1,13 +1,8 @@
 import streamlit as st
-import google.generativeai as genai
-import os
 import json
-import time
 import re  # ✅ Import regex for JSON extraction
 from utils2 import translate_text  # Import translation function
-
-# 🌟 Configure Google Gemini AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from llm_gateway import generate_content  # Shared Gemini client, rate limiting and retries
 
 # 🎨 Load Custom CSS
 def load_css():
@@ -17,13 +12,10 @@ def load_css():
 load_css()
 
 # ✨ Function to Generate AI Quiz in JSON Format
-def generate_quiz(text, num_questions=5, max_retries=3):
+def generate_quiz(text, num_questions=5, max_retries=3, regenerate=False):
     try:
-        model = genai.GenerativeModel('gemini-1.5-pro')
-
+        # Quota errors are retried by the gateway; these attempts are for unusable JSON
         for attempt in range(max_retries):
-            time.sleep(1.5)  # Prevent excessive API calls
-
             # 🔍 AI Prompt for Generating JSON Quiz
             prompt = f"""
             Generate {num_questions} multiple-choice questions (MCQs) based on this text.
@@ -48,7 +40,8 @@ def generate_quiz(text, num_questions=5, max_retries=3):
             Text: {text}
             """
 
-            response = model.generate_content(prompt)
+            # A cached quiz that failed validation is not asked for again on the retries
+            response = generate_content(prompt, regenerate=regenerate or attempt > 0)
 
             # 🔎 Step 2: Extract Only JSON Part
             json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
@@ -107,10 +100,11 @@ def quiz():
     if "user_answers" not in st.session_state:
         st.session_state.user_answers = {}
 
-    # **Generate Quiz Button**
+    # **Generate Quiz Button** (unchanged PDFs and settings are answered from the response cache)
+    regenerate = st.checkbox(translate_text("🔄 Regenerate (ignore the cached result)"))
     if st.button(translate_text("🎯 Generate Quiz")):
         with st.spinner(translate_text("🔍 Generating questions...")):
-            quiz_data = generate_quiz(st.session_state.text_chunks, num_questions)
+            quiz_data = generate_quiz(" ".join(st.session_state.text_chunks), num_questions, regenerate=regenerate)
 
         if quiz_data["questions"]:
             st.session_state.quiz_data = quiz_data
@@ -1,9 +1,8 @@
 import streamlit as st
 import os
 import requests
-import google.generativeai as genai
-import time
 from utils2 import translate_text  # Import translation function
+from llm_gateway import generate_content  # Shared Gemini client, rate limiting and retries
 
 # 🎨 Load Custom CSS
 def load_css():
@@ -12,9 +11,6 @@ def load_css():
 
 load_css()
 
-# 🌍 Configure Gemini AI (for extracting topics)
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
 # 🔍 Function to Fetch Relevant Links using SerpAPI
 def fetch_serpapi_links(query, num_results=5):
     api_key = os.getenv("SERPAPI_API_KEY")
@@ -39,11 +35,9 @@ def fetch_serpapi_links(query, num_results=5):
         return []
 
 # 📌 Extract Key Topics Using AI
-def extract_key_topics():
+def extract_key_topics(regenerate=False):
     try:
-        time.sleep(1.5)  # Prevent excessive API calls
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        response = model.generate_content(f"Extract the top 3 key topics from this text: {st.session_state.text_chunks}")
+        response = generate_content(f"Extract the top 3 key topics from this text: {' '.join(st.session_state.text_chunks)}", regenerate=regenerate)
         topics = [topic.strip() for topic in response.text.split(",")]
         return topics
     except Exception as e:
@@ -75,10 +69,11 @@ def relevant_links():
     with col2:
         st.image("img/links.jpg", width=200, caption=translate_text("Google AI Search"))  # Update with your image path
 
-    # ✨ Generate Relevant Links Button
+    # ✨ Generate Relevant Links Button (topics of unchanged PDFs come from the response cache)
+    regenerate = st.checkbox(translate_text("🔄 Regenerate (ignore the cached result)"))
     if st.button(translate_text("🔍 Find Google Search Links")):
         with st.spinner(translate_text("🔍 Extracting topics from PDFs...")):
-            topics = extract_key_topics()
+            topics = extract_key_topics(regenerate)
 
         if not topics:
             st.error(translate_text("⚠ AI could not determine relevant topics. Try again with another PDF."))
@@ -1,12 +1,7 @@
 import streamlit as st
-import google.generativeai as genai
-import os
 import base64
-import time
 from utils2 import translate_text  # Import translation function
-
-# 🌟 Configure Google Gemini AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from llm_gateway import stream_content  # Shared Gemini client, rate limiting, retries and caching
 
 # 🎨 Load Custom CSS
 def load_css():
@@ -15,19 +10,9 @@ def load_css():
 
 load_css()
 
-# **Function to generate summary**
-def generate_summary(text, summary_type):
-    try:
-        time.sleep(1.5)
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        response = model.generate_content(f"Summarize this text in a {summary_type} format:\n\n{text}")
-
-        if response.text:
-            return response.text.strip()
-        else:
-            return translate_text("⚠ AI could not generate a summary. Try again with different input.")
-    except Exception as e:
-        return f"❌ {translate_text('Error')}: {str(e)}"
+# **Function to generate summary** (streamed: the text is shown while it is being written)
+def generate_summary(text, summary_type, regenerate=False):
+    return stream_content(f"Summarize this text in a {summary_type} format:\n\n{text}", regenerate=regenerate)
 
 # **Function to create a downloadable summary file**
 def create_download_link(summary_text):
@@ -59,15 +44,25 @@ def summary():
     with col2:
         st.image("img/summary.jpg", width=200, caption=translate_text("AI Summary"))  # Update with your image path
 
-    # ✨ Generate Summary Button
+    # ✨ Generate Summary Button (the same PDFs and format are answered from the response cache)
+    regenerate = st.checkbox(translate_text("🔄 Regenerate (ignore the cached result)"))
     if st.button(translate_text("📝 Generate Summary")):
-        with st.spinner(translate_text("Generating summary... 📖")):
-            pdf_text = " ".join(st.session_state.text_chunks)  # Combine all uploaded PDF text
-            summary_text = generate_summary(pdf_text, summary_type)
+        pdf_text = " ".join(st.session_state.text_chunks)  # Combine all uploaded PDF text
+        stream = generate_summary(pdf_text, summary_type, regenerate)
 
-        # 📌 Display Summary in a Styled Box
+        # 📌 Display Summary as it is generated
         st.success(translate_text("✅ AI Summary:"))
-        st.markdown(f"<div style='padding:10px; border-radius:8px;'> {summary_text} </div>", unsafe_allow_html=True)
+        try:
+            st.write_stream(stream)
+        except Exception as e:
+            st.error(f"❌ {translate_text('Error')}: {str(e)}")
+            return
+        summary_text = stream.text.strip()
+        if not summary_text:
+            st.warning(translate_text("⚠ AI could not generate a summary. Try again with different input."))
+            return
+        st.caption(f"⏱ {translate_text('First words after')} {stream.timing.first_token_seconds:.1f}s, "
+                   f"{translate_text('complete after')} {stream.timing.total_seconds:.1f}s")
 
         # 📥 Copy & Download Options
         col_copy, col_download = st.columns([1, 1])
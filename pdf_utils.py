@@ -0,0 +1,327 @@
+import io
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PyPDF2 import PdfReader
+
+# ⚙ Worker processes used for page extraction (override with PDF_WORKERS, 1 disables the pool)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+# 📄 Pages handed to a worker per task; each task re-opens the PDF, so keep batches reasonably large
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+
+# 🗄 Content-addressed cache of extracted page text, shared by every session and restart
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(".cache", "pdf_text"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_MB", "500")) * 1024 * 1024
+# The cache's size is tracked as files are written and recounted by walking the directory (which
+# other app processes also write to) every this many writes
+PDF_CACHE_RECOUNT_EVERY = 50
+
+_pdf_pool = None
+
+
+class PdfTextCache:
+    """Per-page text stored on disk under the SHA-256 of the PDF bytes, evicted least-recently-used by size."""
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None  # bytes of cached files, as of the last recount plus writes since
+        self._count = None
+        self._puts = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+            os.utime(path)  # mark as recently used for eviction
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pages
+
+    def put(self, key, pages):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(pages, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = None
+        os.replace(tmp_path, path)  # atomic, so concurrent readers never see a partial file
+        with self._lock:
+            self._puts += 1
+            if self._size is None or self._puts % PDF_CACHE_RECOUNT_EVERY == 0:
+                self._recount()
+            else:
+                self._size += size - (replaced or 0)
+                self._count += replaced is None
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        return entries
+
+    def _recount(self):
+        entries = self._entries()
+        self._size = sum(size for _, size, _ in entries)
+        self._count = len(entries)
+
+    def evict(self):
+        """Delete least recently used files until the cache fits; walks the directory for their ages."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                count -= 1
+            except OSError:
+                pass
+        self._size, self._count = total, count
+
+    def stats(self):
+        """Hit counts and the tracked size; the directory is only walked on the first call."""
+        with self._lock:
+            if self._size is None:
+                self._recount()
+            count, size = self._count, self._size
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+pdf_text_cache = PdfTextCache()
+
+
+def pdf_fingerprint(data):
+    """Content address of a PDF: identical bytes share extracted text no matter who uploaded them."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def get_pdf_pool():
+    """Return the shared extraction pool, starting it on first use."""
+    global _pdf_pool
+    if _pdf_pool is None:
+        # spawn keeps workers independent of the Streamlit server's threads
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pdf_pool
+
+
+def read_pdf_bytes(pdf_file):
+    """Return the raw bytes of an uploaded file, a path or a bytes object."""
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+# 🔁 Current single-threaded loop, kept as the baseline and for small files
+def extract_pages_serial(pdf_file):
+    pdf_reader = PdfReader(io.BytesIO(read_pdf_bytes(pdf_file)))
+    return [page.extract_text() or "" for page in pdf_reader.pages]
+
+
+# 🌊 Lazily yield one page at a time so consumers that only need a prefix stop parsing early
+def iter_pdf_pages(pdf_file, use_cache=True):
+    data = read_pdf_bytes(pdf_file)
+    key = pdf_fingerprint(data) if use_cache else None
+    if use_cache:
+        cached_pages = pdf_text_cache.get(key)
+        if cached_pages is not None:
+            yield from cached_pages
+            return
+    pages = []
+    for page in PdfReader(io.BytesIO(data)).pages:
+        page_text = page.extract_text() or ""
+        if use_cache:
+            pages.append(page_text)
+        yield page_text
+    if use_cache:
+        # Only reached when the whole file was read, so partial reads never populate the cache
+        try:
+            pdf_text_cache.put(key, pages)
+        except OSError:
+            pass
+
+
+# 🧵 Runs inside a worker process: extract pages [start, stop) from a PDF on disk
+def _extract_page_range(path, start, stop):
+    pdf_reader = PdfReader(path)
+    return [pdf_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def extract_pages_from_pdfs(pdf_files, max_workers=None, progress_callback=None, use_cache=True):
+    """
+    Extract the text of every page of every PDF, splitting large files across the process pool.
+    :param pdf_files: Uploaded files, paths or bytes.
+    :param max_workers: Override PDF_WORKERS; 1 extracts everything on the calling thread.
+    :param progress_callback: Called as progress_callback(pages_done, total_pages).
+    :param use_cache: Serve repeat uploads from pdf_text_cache and store newly extracted files in it.
+    :return: One entry per file, in input order: the list of page texts (in page order),
+             or the exception raised while reading that file.
+    """
+    max_workers = PDF_WORKERS if max_workers is None else max_workers
+    results = [None] * len(pdf_files)
+    documents = []  # (file index, bytes, number of pages)
+    keys = [None] * len(pdf_files)
+    for idx, pdf_file in enumerate(pdf_files):
+        try:
+            data = read_pdf_bytes(pdf_file)
+            if use_cache:
+                keys[idx] = pdf_fingerprint(data)
+                cached_pages = pdf_text_cache.get(keys[idx])
+                if cached_pages is not None:
+                    results[idx] = cached_pages  # already parsed once, skip PyPDF2 entirely
+                    continue
+            documents.append((idx, data, len(PdfReader(io.BytesIO(data)).pages)))
+        except Exception as e:
+            results[idx] = e
+
+    total_pages = sum(num_pages for _, _, num_pages in documents)
+    done_pages = 0
+
+    def report(pages):
+        nonlocal done_pages
+        done_pages += pages
+        if progress_callback:
+            progress_callback(done_pages, total_pages)
+
+    futures = {}
+    temp_paths = []
+    serial_documents = []
+    try:
+        # 🚀 Queue the large files on the pool first so workers are busy while small ones run here
+        for idx, data, num_pages in documents:
+            results[idx] = [""] * num_pages
+            if max_workers <= 1 or num_pages < 2 * PAGES_PER_TASK:
+                serial_documents.append((idx, data))
+                continue
+            # Workers read the file from disk instead of receiving a pickled copy per task
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+                tmp_file.write(data)
+            temp_paths.append(tmp_file.name)
+            for start in range(0, num_pages, PAGES_PER_TASK):
+                stop = min(start + PAGES_PER_TASK, num_pages)
+                future = get_pdf_pool().submit(_extract_page_range, tmp_file.name, start, stop)
+                futures[future] = (idx, start, stop)
+
+        for idx, data in serial_documents:
+            try:
+                pdf_reader = PdfReader(io.BytesIO(data))
+                for page_number, page in enumerate(pdf_reader.pages):
+                    results[idx][page_number] = page.extract_text() or ""
+                    report(1)
+            except Exception as e:
+                results[idx] = e
+
+        for future in as_completed(futures):
+            idx, start, stop = futures[future]
+            try:
+                pages = future.result()
+                if not isinstance(results[idx], Exception):
+                    results[idx][start:stop] = pages
+            except Exception as e:
+                results[idx] = e
+            report(stop - start)
+    finally:
+        for future in futures:
+            future.cancel()
+        for path in temp_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    if use_cache:
+        for idx, _, _ in documents:
+            if not isinstance(results[idx], Exception):
+                try:
+                    pdf_text_cache.put(keys[idx], results[idx])
+                except OSError:
+                    pass  # a read-only or full disk only costs us the cache
+    return results
+
+
+class IngestedUploads:
+    """
+    Remembers what was already done with each uploaded PDF across Streamlit reruns.
+    Keep one instance in st.session_state: files are keyed by the hash of their bytes, so
+    a rerun processes nothing, a new upload processes only that file, and removing an
+    upload drops only its artifacts.
+    """
+
+    def __init__(self):
+        self.hash_by_upload = {}  # (upload id, size) -> content hash, avoids re-hashing on reruns
+        self.artifacts = {}  # content hash -> whatever ingest() produced (None if it failed)
+
+    @staticmethod
+    def _upload_id(uploaded_file):
+        return (getattr(uploaded_file, "file_id", None) or uploaded_file.name, uploaded_file.size)
+
+    def sync(self, uploaded_files, ingest):
+        """
+        :param ingest: Called as ingest([(content_hash, uploaded_file), ...]) for files not seen
+                       before; returns a dict of content_hash -> artifact.
+        :return: (artifacts of the current uploads in upload order, content hashes ingested now)
+        """
+        keys = []
+        new_files = {}
+        for uploaded_file in uploaded_files:
+            upload_id = self._upload_id(uploaded_file)
+            key = self.hash_by_upload.get(upload_id)
+            if key is None:
+                key = pdf_fingerprint(read_pdf_bytes(uploaded_file))
+                self.hash_by_upload[upload_id] = key
+            keys.append(key)
+            if key not in self.artifacts and key not in new_files:
+                new_files[key] = uploaded_file
+        if new_files:
+            produced = ingest(list(new_files.items()))
+            for key in new_files:
+                self.artifacts[key] = produced.get(key)
+
+        current = set(keys)
+        self.artifacts = {key: artifact for key, artifact in self.artifacts.items() if key in current}
+        self.hash_by_upload = {upload_id: key for upload_id, key in self.hash_by_upload.items() if key in current}
+        artifacts = [self.artifacts[key] for key in dict.fromkeys(keys) if self.artifacts[key] is not None]
+        return artifacts, list(new_files)
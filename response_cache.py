@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import textwrap
+import threading
+from collections import namedtuple
+
+# 📝 Generated texts kept on disk, keyed by (model, prompt, generation settings), shared by every
+# session and restart; entries older than the TTL are regenerated
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(".cache", "responses.sqlite3"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", "200")) * 1024 * 1024
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_HOURS", "168")) * 3600
+# The cache's size is tracked as rows are written and recounted from the table (which other app
+# processes also write to) every this many writes, when expired rows are deleted too
+RESPONSE_CACHE_RECOUNT_EVERY = 100
+
+# What a cache hit returns in place of a Gemini response: only .text is used by the app
+CachedResponse = namedtuple("CachedResponse", ["text"])
+
+
+def prompt_key(model, prompt, params=None):
+    """
+    Cache key of one generation call. The prompt is dedented and stripped, so the same template
+    indented differently is one entry, while newlines and spacing inside it (which can change
+    the answer) are kept; settings are part of the key.
+    """
+    digest = hashlib.sha256(textwrap.dedent(str(prompt)).strip().encode("utf-8"))
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode("utf-8"))
+    return model, digest.digest()
+
+
+class ResponseCache:
+    """
+    SQLite table of response texts keyed by (model, prompt hash), like EmbeddingCache: one
+    shared connection behind a lock, WAL mode for several app processes. Expired rows are
+    skipped on lookup and deleted with the oldest rows when the cache outgrows max_bytes,
+    measured in UTF-8 bytes of text.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = None  # bytes of text in the table, as of the last recount plus writes since
+        self._entries = None
+        self._puts = 0
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "model TEXT NOT NULL, hash BLOB NOT NULL, text TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (model, hash))"
+            )
+        return self._conn
+
+    def get(self, key):
+        """The cached text for key, or None if missing or older than the TTL."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT text FROM responses WHERE model = ? AND hash = ? AND created_at > ?",
+                [*key, time.time() - self.ttl],
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, text):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                replaced = conn.execute("SELECT LENGTH(CAST(text AS BLOB)) FROM responses WHERE model = ? AND hash = ?",
+                                        key).fetchone()
+                conn.execute("INSERT OR REPLACE INTO responses (model, hash, text, created_at) VALUES (?, ?, ?, ?)",
+                             [*key, text, time.time()])
+                self._puts += 1
+                if self._size is None or self._puts % RESPONSE_CACHE_RECOUNT_EVERY == 0:
+                    self._recount(conn)
+                else:
+                    self._size += len(text.encode("utf-8")) - (replaced[0] if replaced else 0)
+                    self._entries += 0 if replaced else 1
+                if self._size > self.max_bytes:
+                    self._evict(conn)
+
+    def _recount(self, conn):
+        conn.execute("DELETE FROM responses WHERE created_at <= ?", [time.time() - self.ttl])
+        self._entries, self._size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(text AS BLOB))), 0) FROM responses").fetchone()
+
+    def _evict(self, conn):
+        # Drop the oldest rows until the cache is back under 90% of its limit
+        excess = self._size - int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for rowid, length in conn.execute("SELECT rowid, LENGTH(CAST(text AS BLOB)) FROM responses ORDER BY created_at"):
+            stale.append((rowid,))
+            freed += length
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE rowid = ?", stale)
+        self._size -= freed
+        self._entries -= len(stale)
+
+    def stats(self):
+        """Hit counts and the tracked size; the table is only counted on the first call."""
+        with self._lock:
+            if self._size is None:
+                conn = self._connection()
+                with conn:
+                    self._recount(conn)
+            entries, size = self._entries, self._size
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+response_cache = ResponseCache()
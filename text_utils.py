@@ -0,0 +1,245 @@
+import os
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, repeat
+from operator import add, sub
+
+# 🪟 How many chunk sizes of text are buffered before the splitter runs on it
+STREAM_WINDOW_CHUNKS = 4
+
+
+def iter_text_chunks(pages, text_splitter, chunk_size):
+    """
+    Split a stream of page texts into chunks without ever joining the whole document.
+    Only a window of a few chunk sizes is held in memory; the last chunk of every window
+    is carried over so it can merge with the following pages (and keep its overlap).
+    :param pages: Iterable of page texts (a generator is consumed lazily).
+    :param text_splitter: Any LangChain-style splitter exposing split_text().
+    :param chunk_size: The splitter's chunk size, used to size the window.
+    """
+    buffer = ""
+    window = STREAM_WINDOW_CHUNKS * chunk_size
+    for page in pages:
+        buffer += page
+        if len(buffer) < window:
+            continue
+        chunks = text_splitter.split_text(buffer)
+        if len(chunks) < 2:
+            # Chunks are longer than chunk_size characters (e.g. token-sized), so widen the window
+            window = 2 * len(buffer)
+            continue
+        yield from chunks[:-1]
+        carry_start = buffer.rfind(chunks[-1])
+        if carry_start == -1:
+            # The splitter rewrote the last chunk, so it cannot be located; emit it as is
+            yield chunks[-1]
+            buffer = ""
+        else:
+            buffer = buffer[carry_start:]
+    if buffer.strip():
+        yield from text_splitter.split_text(buffer)
+
+
+def join_prefix(texts, max_chars, separator=" "):
+    """Join texts until more than max_chars characters are collected, ignoring the rest."""
+    parts = []
+    total = 0
+    for text in texts:
+        parts.append(text)
+        total += len(text) + len(separator)
+        if total > max_chars:
+            break
+    return separator.join(parts)
+
+
+class FastTextSplitter:
+    """
+    Drop-in replacement for LangChain's RecursiveCharacterTextSplitter / CharacterTextSplitter
+    with the same separator and merge semantics (and the same output). Pieces are kept as
+    start/end offsets found with one str.split per separator level, and the merge window is
+    placed with bisect over cumulative piece lengths instead of re-slicing lists piece by
+    piece, so long texts are split in linear time.
+    :param recursive: False behaves like CharacterTextSplitter: only the first separator is
+                      used and oversized pieces are not split further.
+    :param length_function: Measures a piece (default: characters). Like LangChain, a chunk's
+                            length is the sum of its pieces and separators, so token counters
+                            such as approx_token_count give token-budgeted chunks.
+    """
+
+    def __init__(self, chunk_size=4000, chunk_overlap=200, separators=None,
+                 keep_separator=True, strip_whitespace=True, recursive=True, length_function=None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller.")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or ["\n\n", "\n", " ", ""]
+        self.keep_separator = keep_separator
+        self.strip_whitespace = strip_whitespace
+        self.recursive = recursive
+        self.length_function = length_function
+
+    def split_text(self, text):
+        return [text[start:end] if chunk is None else chunk for start, end, chunk in self._split(text)]
+
+    def split_spans(self, text):
+        """Chunk (start, end) offsets into text; needs keep_separator so chunks are contiguous."""
+        if not self.keep_separator:
+            raise ValueError("split_spans() requires keep_separator=True")
+        return [(start, end) for start, end, _ in self._split(text)]
+
+    def _split(self, text):
+        chunks = []  # (start, end, joined text or None when the chunk is text[start:end])
+        if self.recursive:
+            self._split_range(text, 0, len(text), self.separators, chunks)
+        else:
+            separator = self.separators[0]
+            starts, ends = self._find_pieces(text, 0, len(text), separator)
+            lengths = self._piece_lengths(text, starts, ends)
+            self._merge(text, starts, ends, lengths, 0, len(starts), "" if self.keep_separator else separator, chunks)
+        return chunks
+
+    def _piece_lengths(self, text, starts, ends):
+        if self.length_function is None:
+            return list(map(sub, ends, starts))
+        return [self.length_function(text[s:e]) for s, e in zip(starts, ends)]
+
+    def _find_pieces(self, text, start, end, separator):
+        """Offsets of the non-empty pieces re.split() would produce (a kept separator starts its piece)."""
+        if not separator:
+            return list(range(start, end)), list(range(start + 1, end + 1))
+        pieces = text[start:end].split(separator)
+        sep_len = len(separator)
+        # End of piece i is start + len(pieces[0..i]) + i * sep_len (computed without a Python-level loop)
+        ends = list(accumulate(map(add, map(len, pieces), repeat(sep_len)), initial=start - sep_len))[1:]
+        if self.keep_separator:
+            starts = [start] + ends[:-1]
+            if ends[0] == start:  # only the first piece can be empty
+                del starts[0], ends[0]
+            return starts, ends
+        starts = list(map(sub, ends, map(len, pieces)))
+        keep = [i for i in range(len(pieces)) if ends[i] > starts[i]]
+        if len(keep) != len(pieces):
+            starts = [starts[i] for i in keep]
+            ends = [ends[i] for i in keep]
+        return starts, ends
+
+    def _split_range(self, text, start, end, separators, chunks):
+        separator = separators[-1]
+        remaining = []
+        for i, candidate in enumerate(separators):
+            if not candidate:
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        merge_separator = "" if self.keep_separator else separator
+        starts, ends = self._find_pieces(text, start, end, separator)
+        lengths = self._piece_lengths(text, starts, ends)
+        oversized = [] if not lengths or max(lengths) < self.chunk_size else [
+            i for i, length in enumerate(lengths) if length >= self.chunk_size]
+        group_start = 0
+        for i in oversized:
+            if i > group_start:
+                self._merge(text, starts, ends, lengths, group_start, i, merge_separator, chunks)
+            if remaining:
+                self._split_range(text, starts[i], ends[i], remaining, chunks)
+            else:
+                chunks.append((starts[i], ends[i], None))  # oversized and unsplittable: kept as is, unstripped
+            group_start = i + 1
+        if group_start < len(starts):
+            self._merge(text, starts, ends, lengths, group_start, len(starts), merge_separator, chunks)
+
+    def _merge(self, text, starts, ends, lengths, lo, hi, separator, chunks):
+        """Merge pieces lo..hi-1 into chunks, carrying chunk_overlap between neighbours."""
+        # Lay the pieces out as they would be joined (each followed by the merge separator):
+        # the length of any run of pieces is then joined_ends[last] - joined_starts[first],
+        # so both window edges can be found with bisect instead of walking piece by piece.
+        if lo >= hi:
+            return
+        separator_len = 0
+        if separator:
+            separator_len = len(separator) if self.length_function is None else self.length_function(separator)
+        group_lengths = lengths[lo:hi]
+        joined_starts = list(accumulate(map(add, group_lengths, repeat(separator_len)), initial=0))[:-1]
+        joined_ends = list(map(add, joined_starts, group_lengths))
+        chunk_size, chunk_overlap = self.chunk_size, self.chunk_overlap
+        count = hi - lo
+        first = 0
+        while True:
+            # First piece that no longer fits behind the start of the window
+            nxt = bisect_right(joined_ends, joined_starts[first] + chunk_size, first + 1, count)
+            if nxt >= count:
+                self._emit(text, starts, ends, lo + first, hi, separator, chunks)
+                return
+            self._emit(text, starts, ends, lo + first, lo + nxt, separator, chunks)
+            # Drop pieces from the front until at most chunk_overlap remains and the next piece fits
+            first = max(bisect_left(joined_starts, joined_ends[nxt - 1] - chunk_overlap, first, nxt),
+                        bisect_left(joined_starts, joined_ends[nxt] - chunk_size, first, nxt))
+
+    def _emit(self, text, starts, ends, first, stop, separator, chunks):
+        if first >= stop:
+            return
+        start, end = starts[first], ends[stop - 1]
+        if self.keep_separator or stop - first == 1 or text.count(separator, start, end) == stop - first - 1:
+            chunk = None  # contiguous in text (no empty pieces were dropped in between)
+        else:
+            chunk = separator.join(text[starts[i]:ends[i]] for i in range(first, stop))
+        if self.strip_whitespace:
+            if chunk is None:
+                piece = text[start:end]
+                stripped = piece.lstrip()
+                start += len(piece) - len(stripped)
+                end = start + len(stripped.rstrip())
+            else:
+                chunk = chunk.strip()
+        if (end > start) if chunk is None else chunk:
+            chunks.append((start, end, chunk))
+
+
+# 🔢 Fast local token estimate: about 4 UTF-8 bytes per token for English text. Hindi and
+# Chinese characters take 3 bytes each, so dense scripts count as many more tokens than
+# their character count suggests, which is what keeps them inside the model's limits.
+BYTES_PER_TOKEN = 4
+
+
+def approx_token_count(text):
+    return len(text.encode("utf-8")) / BYTES_PER_TOKEN
+
+
+# ⚙ Every chunking configuration used by the app, in one place
+CHUNK_CONFIGS = {
+    # app.py Q&A index and session chunks (LangChain's RecursiveCharacterTextSplitter defaults)
+    "qa": dict(chunk_size=4000, chunk_overlap=200),
+    # HomeMenu vector store
+    "vector_store": dict(chunk_size=10000, chunk_overlap=1000, separators=["\n\n", "\n", ".", " ", ""]),
+    # app.process_text knowledge base (was CharacterTextSplitter on newlines)
+    "knowledge_base": dict(chunk_size=1000, chunk_overlap=200, separators=["\n"], keep_separator=False, recursive=False),
+}
+
+
+# 📏 "chars" sizes chunks by character count, "tokens" fills the token budgets below
+CHUNK_LENGTH_MODE = os.getenv("CHUNK_LENGTH_MODE", "chars")
+
+# (chunk_size, chunk_overlap) in tokens for "tokens" mode; embedding-001 accepts at most
+# 2048 tokens per text, so everything that gets embedded stays below that
+TOKEN_BUDGETS = {
+    "qa": (1800, 90),
+    "vector_store": (1800, 180),
+    "knowledge_base": (250, 50),
+}
+
+
+def get_text_splitter(name, length_mode=None, token_counter=approx_token_count):
+    """
+    Build the splitter for one of CHUNK_CONFIGS.
+    :param length_mode: "chars" or "tokens" (default: CHUNK_LENGTH_MODE).
+    :param token_counter: Callable text -> token count used in "tokens" mode; pass a real
+                          tokenizer here to replace the local estimate.
+    """
+    config = dict(CHUNK_CONFIGS[name])
+    if (length_mode or CHUNK_LENGTH_MODE) == "tokens":
+        config["chunk_size"], config["chunk_overlap"] = TOKEN_BUDGETS[name]
+        config["length_function"] = token_counter
+    return FastTextSplitter(**config)